@@ -0,0 +1,134 @@
+# benchmarks/model_loading.py
+"""
+Замер памяти и времени загрузки модели в N параллельных процессах-предсказателях.
+
+Обучает синтетический RandomForest, регистрирует его во временном реестре и
+запускает N процессов в каждом режиме загрузки:
+  full         — полная модель (registry.load_model(mmap_mode=None));
+  joblib_mmap  — model.joblib через joblib.load(mmap_mode='r'): sklearn всё равно
+                 копирует узлы деревьев в каждый процесс;
+  serving_mmap — serving.joblib + trees/*.npy через mmap (registry.load_model()).
+
+Для каждого процесса считается прирост Rss, Pss и Private (из
+/proc/self/smaps_rollup, только Linux) после загрузки и первого предсказания,
+а также время загрузки и предсказания для 1000 строк.
+Rss учитывает общие страницы в каждом процессе целиком, поэтому разделение
+памяти видно по Pss и Private.
+
+Запуск из корня проекта:
+    python -m benchmarks.model_loading --workers 8
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+from src.models import registry
+from src.models.solubility_model import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, _build_preprocessor
+
+MODES = ("full", "joblib_mmap", "serving_mmap")
+
+
+def _make_frame(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_rows, len(NUMERICAL_FEATURES))), columns=NUMERICAL_FEATURES)
+    df[CATEGORICAL_FEATURES[0]] = rng.choice(["O", "CCO", "CC(C)O", "C1CCOC1", "CS(C)=O"], n_rows)
+    y = df[NUMERICAL_FEATURES].sum(axis=1) + rng.normal(scale=0.5, size=n_rows)
+    return df, y
+
+
+def _memory_kb():
+    """Rss, Pss и Private (Private_Clean + Private_Dirty) текущего процесса, кБ."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":"):
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "private": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+def _worker(registry_dir, version, mode, loaded, measured, results):
+    registry.REGISTRY_DIR = registry_dir
+    X, _ = _make_frame(1000, seed=1)
+    before = _memory_kb()
+
+    start = time.perf_counter()
+    if mode == "full":
+        model = registry.load_model(version, mmap_mode=None)
+    elif mode == "joblib_mmap":
+        model = joblib.load(os.path.join(registry_dir, version, registry.ARTIFACT_FILE), mmap_mode="r")
+    else:
+        model = registry.load_model(version, mmap_mode="r")
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    model.predict(X)
+    predict_time = time.perf_counter() - start
+
+    # Меряем, когда все процессы загрузили модель: только тогда Pss делит общие страницы
+    loaded.wait()
+    after = _memory_kb()
+    results.put({
+        "mode": mode,
+        "load_sec": load_time,
+        "predict_1000_sec": predict_time,
+        **{f"{key}_mb": (after[key] - before[key]) / 1024 for key in after},
+    })
+    measured.wait()
+
+
+def run(workers, n_rows, n_trees):
+    with tempfile.TemporaryDirectory() as registry_dir:
+        registry.REGISTRY_DIR = registry_dir
+        print(f"🌲 Обучение RandomForest: {n_trees} деревьев на {n_rows} строках...")
+        X, y = _make_frame(n_rows, seed=0)
+        pipeline = Pipeline([
+            ('preprocessor', _build_preprocessor()),
+            ('regressor', RandomForestRegressor(n_estimators=n_trees, random_state=42, n_jobs=-1))
+        ]).fit(X, y)
+        version = registry.register_model(pipeline, "RandomForest", {}, {}, "benchmark", 0.0)
+
+        ctx = mp.get_context("spawn")
+        rows = []
+        for mode in MODES:
+            loaded, measured = ctx.Barrier(workers), ctx.Barrier(workers + 1)
+            results = ctx.Queue()
+            processes = [
+                ctx.Process(target=_worker, args=(registry_dir, version, mode, loaded, measured, results))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            rows.extend(results.get() for _ in range(workers))
+            measured.wait()
+            for process in processes:
+                process.join()
+
+    summary = pd.DataFrame(rows).groupby("mode").mean().reindex(list(MODES))
+    print(f"\n--- 📊 Среднее на процесс ({workers} процессов) ---")
+    print(summary.to_string(float_format=lambda v: f"{v:.3f}"))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Память и время загрузки модели в N процессах.")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args(argv)
+    run(args.workers, args.rows, args.trees)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# src/data/columnar.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Манифест колоночной копии: состав столбцов и размер/mtime CSV, из которого она записана
+MANIFEST_FILE = "manifest.json"
+
+
+def columnar_path(csv_path):
+    """Каталог колоночной копии CSV: data/processed/x.csv -> data/processed/x.columns"""
+    return os.path.splitext(csv_path)[0] + ".columns"
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_columnar(df, csv_path):
+    """
+    Пишет колоночную копию уже сохранённого csv_path: по одному .npy на столбец.
+    Числовые столбцы хранятся как есть, строковые — кодами категорий
+    (<столбец>.codes.npy) и словарём значений (<столбец>.categories.npy),
+    так что чтение не разбирает текст и не требует pickle.
+    Манифест пишется последним: копия без него (или от другого CSV) не используется.
+    """
+    out_dir = columnar_path(csv_path)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    kinds = {}
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            np.save(os.path.join(out_dir, f"{column}.npy"), values.to_numpy())
+            kinds[column] = "numeric"
+        else:
+            codes, categories = pd.factorize(values.astype(object))
+            np.save(os.path.join(out_dir, f"{column}.codes.npy"), codes.astype(np.int32))
+            np.save(os.path.join(out_dir, f"{column}.categories.npy"), np.asarray(categories, dtype=str))
+            kinds[column] = "categorical"
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"columns": kinds, "source": _source_stamp(csv_path)}, f, ensure_ascii=False, indent=2)
+    print(f"💾 Колоночная копия сохранена в {out_dir}")
+
+
+def read_columns(csv_path, columns):
+    """
+    Читает нужные столбцы: из колоночной копии, если она записана из текущей
+    версии csv_path, иначе из самого CSV. Строковые столбцы колоночной копии
+    возвращаются как category.
+    """
+    out_dir = columnar_path(csv_path)
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["source"] == _source_stamp(csv_path) and set(columns) <= set(manifest["columns"]):
+            data = {}
+            for column in columns:
+                if manifest["columns"][column] == "numeric":
+                    data[column] = np.load(os.path.join(out_dir, f"{column}.npy"))
+                else:
+                    data[column] = pd.Categorical.from_codes(
+                        np.load(os.path.join(out_dir, f"{column}.codes.npy")),
+                        np.load(os.path.join(out_dir, f"{column}.categories.npy")).astype(object)
+                    )
+            return pd.DataFrame(data)
+
+    return pd.read_csv(csv_path, usecols=columns, low_memory=False)
@@ -3,9 +3,16 @@ import pandas as pd
 import os
 
 
-def load_solubility_data():
-    """Загрузка BigSolDBv2.0.csv с явным указанием типов"""
-    file_path = "data/raw/BigSolDBv2.0.csv"
+# Собственные измерения, добавленные командой update. Формат тот же, что у
+# BigSolDBv2.0.csv, и process_solubility_data объединяет оба источника.
+INHOUSE_DATA_PATH = "data/raw/inhouse_measurements.csv"
+
+# Столбцы, по которым измерение считается повтором уже сохранённого
+MEASUREMENT_KEY = ['smiles', 'solvent', 'temperature_k', 'log_s']
+
+
+def load_solubility_data(file_path="data/raw/BigSolDBv2.0.csv"):
+    """Загрузка BigSolDBv2.0.csv (или файла того же формата) с явным указанием типов"""
 
     if not os.path.exists(file_path):
         raise FileNotFoundError(
@@ -37,7 +44,8 @@ def load_solubility_data():
     }
 
     # Указываем low_memory=False, чтобы избежать предупреждения
-    df = pd.read_csv(file_path, header=None, low_memory=False)
+    # round_trip: повторно прочитанные измерения совпадают до бита (дедупликация по хэшам)
+    df = pd.read_csv(file_path, header=None, low_memory=False, float_precision='round_trip')
 
     # Назначаем колонки
     column_names = list(dtypes.keys())
@@ -53,4 +61,58 @@ def load_solubility_data():
     df = df.dropna(subset=['smiles', 'log_s'])
 
     print(f"✅ Загружено {len(df)} записей о растворимости")
-    return df
\ No newline at end of file
+    return df
+
+
+def load_inhouse_data():
+    """Загрузка собственных измерений или None, если их ещё нет."""
+    if not os.path.exists(INHOUSE_DATA_PATH):
+        return None
+    return load_solubility_data(INHOUSE_DATA_PATH)
+
+
+def measurement_hashes(df):
+    """Хэш каждого измерения по MEASUREMENT_KEY (Series строк, выровненная по df)."""
+    key = df[MEASUREMENT_KEY].astype({
+        'smiles': str, 'solvent': str, 'temperature_k': 'float64', 'log_s': 'float64'
+    })
+    return pd.util.hash_pandas_object(key, index=False).map('{:016x}'.format)
+
+
+def select_new_measurements(df, seen_hashes=None):
+    """
+    Оставляет только измерения, которые ещё не учтены моделью.
+
+    seen_hashes — хэши измерений, учтённых активной версией модели
+    (см. registry.load_measurement_hashes). Если None, новыми считаются
+    измерения, которых нет в хранилище собственных данных.
+    """
+    df = df.drop_duplicates(subset=MEASUREMENT_KEY)
+    if seen_hashes is None:
+        stored = load_inhouse_data()
+        if stored is None:
+            return df
+        seen_hashes = set(measurement_hashes(stored))
+
+    new_rows = df[~measurement_hashes(df).isin(seen_hashes).to_numpy()]
+    print(f"🗑️  Уже учтённых измерений пропущено: {len(df) - len(new_rows)}")
+    return new_rows
+
+
+def append_inhouse_data(df):
+    """
+    Атомарно дописывает измерения в хранилище собственных данных.
+    Уже сохранённые измерения (по MEASUREMENT_KEY) повторно не добавляются:
+    после отката модели те же строки могут пройти через update ещё раз.
+    """
+    stored = load_inhouse_data()
+    combined = df if stored is None else pd.concat([stored, df], ignore_index=True)
+    combined = combined.drop_duplicates(subset=MEASUREMENT_KEY)
+    n_added = len(combined) - (0 if stored is None else len(stored))
+
+    os.makedirs(os.path.dirname(INHOUSE_DATA_PATH), exist_ok=True)
+    tmp_path = INHOUSE_DATA_PATH + ".tmp"
+    # Без заголовка, как в BigSolDBv2.0.csv: load_solubility_data сам назначает столбцы
+    combined.to_csv(tmp_path, header=False, index=False)
+    os.replace(tmp_path, INHOUSE_DATA_PATH)
+    print(f"💾 Сохранено {n_added} новых измерений в {INHOUSE_DATA_PATH}")
@@ -2,17 +2,11 @@
 
 import os
 import pandas as pd
-from src.data.load_data import load_solubility_data
-
-def process_solubility_data():
-    """Обработка данных: очистка, фичи, статистика."""
-    print("📥 Загрузка основного датасета...")
-    df = load_solubility_data()
-
-    print(f"📊 Исходный размер: {df.shape}")
-
-    # --- ИЗМЕНЕНИЕ: ВЕСЬ БЛОК ПРО ПЛОТНОСТИ УДАЛЕН ---
+from src.data.columnar import write_columnar
+from src.data.load_data import load_inhouse_data, load_solubility_data
 
+def clean_solubility_data(df):
+    """Очистка и простые фичи: дубликаты, фильтр по logS, температура в °C, категории."""
     # 1. Удаление дубликатов
     initial_count = len(df)
     df = df.drop_duplicates()
@@ -29,11 +23,32 @@ def process_solubility_data():
         lambda x: 'water' if x == 'O' else
         'alcohol' if x in ['CCO', 'CC(C)O', 'CCCO'] else 'other'
     )
+    return df
+
+
+def process_solubility_data():
+    """Обработка данных: очистка, фичи, статистика."""
+    print("📥 Загрузка основного датасета...")
+    df = load_solubility_data()
+
+    # Собственные измерения, добавленные через update, входят в полное обучение
+    df_inhouse = load_inhouse_data()
+    if df_inhouse is not None:
+        print(f"📥 Добавлено собственных измерений: {len(df_inhouse)}")
+        df = pd.concat([df, df_inhouse], ignore_index=True)
+
+    print(f"📊 Исходный размер: {df.shape}")
+
+    # --- ИЗМЕНЕНИЕ: ВЕСЬ БЛОК ПРО ПЛОТНОСТИ УДАЛЕН ---
+
+    df = clean_solubility_data(df)
 
     # 4. Сохранение
     os.makedirs("data/processed", exist_ok=True)
     final_file_path = "data/processed/solubility_clean.csv" # Возвращаем старое имя файла
     df.to_csv(final_file_path, index=False)
+    # Колоночная копия: агрегированный EDA-отчёт читает нужные столбцы без разбора CSV
+    write_columnar(df, final_file_path)
 
     # 5. Статистика (убрали упоминания плотности)
     with open("data/processed/data_stats.txt", "w", encoding="utf-8") as f:
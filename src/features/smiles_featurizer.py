@@ -2,6 +2,7 @@
 from rdkit import Chem
 from rdkit.Chem import Descriptors
 from rdkit.Chem import rdMolDescriptors  # <-- Используем это
+from rdkit.Chem.Scaffolds import MurckoScaffold
 import pandas as pd
 import numpy as np
 
@@ -63,4 +64,19 @@ def featurize_compounds(df):
     df_result = pd.concat([df.reset_index(drop=True), feature_df], axis=1)
 
     print(f"✅ Добавлено {len(feature_df.columns)} молекулярных признаков")
-    return df_result
\ No newline at end of file
+    return df_result
+
+def calculate_scaffold(smiles):
+    """
+    Скаффолд Мурко для SMILES (используется для групповой кросс-валидации).
+    Для ациклических или нераспознанных молекул возвращает сам SMILES.
+    """
+    try:
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            return smiles
+        scaffold = MurckoScaffold.MurckoScaffoldSmiles(mol=mol)
+        return scaffold or smiles
+    except Exception as e:
+        print(f"Ошибка при расчёте скаффолда: {smiles}, {e}")
+        return smiles
@@ -0,0 +1,301 @@
+# src/models/registry.py
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка pointer-файла недоступна
+    fcntl = None
+
+import joblib
+import pandas as pd
+from sklearn.pipeline import Pipeline
+
+from src.models.tree_arrays import export_tree_ensemble, save_arrays
+
+
+REGISTRY_DIR = "models/registry"
+POINTER_FILE = "CURRENT.json"
+# Блокировка на время чтения-изменения-записи pointer-файла (promote/rollback)
+POINTER_LOCK_FILE = ".pointer.lock"
+ARTIFACT_FILE = "model.joblib"
+METADATA_FILE = "metadata.json"
+HOLDOUT_FILE = "holdout.csv"
+# Хэши собственных измерений, которые учтены моделью этой версии (по одному в строке)
+MEASUREMENTS_FILE = "measurements.txt"
+# Версия для предсказаний: деревья лежат в TREES_DIR как .npy и читаются через mmap
+SERVING_FILE = "serving.joblib"
+TREES_DIR = "trees"
+
+VERSION_PATTERN = re.compile(r"^v(\d+)$")
+# Сколько раз пытаться занять следующий номер, если его успел занять другой процесс
+MAX_REGISTER_ATTEMPTS = 20
+
+# Старый формат: одна модель без версий. Используется, если реестр пуст.
+LEGACY_MODEL_PATH = "models/best_model.pkl"
+
+
+def compute_data_hash(X, y):
+    """SHA-256 обучающих данных (признаки + целевая переменная) для метаданных версии."""
+    hashed = pd.util.hash_pandas_object(pd.concat([X, y], axis=1), index=False)
+    return hashlib.sha256(hashed.to_numpy().tobytes()).hexdigest()
+
+
+def chain_data_hash(parent_hash, X, y):
+    """Хэш данных обновлённой версии: хэш родителя + хэш новых строк."""
+    return hashlib.sha256(f"{parent_hash}:{compute_data_hash(X, y)}".encode()).hexdigest()
+
+
+def _next_version_number():
+    """
+    Следующий номер версии по именам каталогов vNNNN, включая неполные
+    (без metadata.json), чтобы не пытаться занять уже существующий каталог.
+    """
+    numbers = [
+        int(match.group(1))
+        for match in map(VERSION_PATTERN.match, os.listdir(REGISTRY_DIR))
+        if match
+    ]
+    return max(numbers, default=0) + 1
+
+
+def _atomic_write_json(path, data):
+    """
+    Пишет JSON во временный файл с уникальным именем рядом с path, сбрасывает
+    его на диск и атомарно подменяет path: читатели видят старый или новый файл целиком.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def _pointer_lock():
+    """
+    Эксклюзивная блокировка pointer-файла: одновременные promote/rollback
+    (например, два параллельных update) выполняются по очереди и не теряют историю.
+    """
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    with open(os.path.join(REGISTRY_DIR, POINTER_LOCK_FILE), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_pointer():
+    path = os.path.join(REGISTRY_DIR, POINTER_FILE)
+    if not os.path.exists(path):
+        return {"current": None, "history": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_versions():
+    """Возвращает метаданные всех версий, отсортированные по номеру."""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    versions = []
+    for name in sorted(os.listdir(REGISTRY_DIR)):
+        if not VERSION_PATTERN.match(name):
+            continue
+        metadata_path = os.path.join(REGISTRY_DIR, name, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as f:
+                versions.append(json.load(f))
+    return versions
+
+
+def current_version():
+    """Версия, на которую указывает pointer-файл, или None."""
+    return _read_pointer()["current"]
+
+
+def _write_serving_artifact(pipeline, version_dir):
+    """Пишет serving.joblib и trees/*.npy, если регрессор — поддерживаемый ансамбль деревьев."""
+    steps = getattr(pipeline, "named_steps", {})
+    if "regressor" not in steps:
+        return False
+    exported = export_tree_ensemble(steps["regressor"])
+    if exported is None:
+        return False
+
+    ensemble, arrays = exported
+    save_arrays(arrays, os.path.join(version_dir, TREES_DIR))
+    serving = Pipeline(pipeline.steps[:-1] + [("regressor", ensemble)])
+    joblib.dump(serving, os.path.join(version_dir, SERVING_FILE))
+    return True
+
+
+def register_model(pipeline, model_name, metrics, feature_schema, data_hash, training_time,
+                   holdout=None, parent=None, holdout_group_by=None, measurement_hashes=None):
+    """
+    Сохраняет модель как новую неизменяемую версию реестра.
+
+    model.joblib — полная модель для дообучения. Для RandomForest и
+    GradientBoosting дополнительно пишется serving.joblib, где регрессор заменён
+    на MmapTreeEnsemble, а узлы деревьев сохранены в trees/*.npy: их
+    предсказатели отображают в память, и процессы на одном хосте разделяют
+    страницы через page cache. Версия сначала собирается во временной папке и затем переименовывается,
+    так что незавершённая запись никогда не видна читателям.
+    holdout — отложенная выборка, на которой проверяются обновления этой версии,
+    holdout_group_by — группировка, по которой она отложена ('compound',
+    'scaffold' или 'row' для случайного разбиения строк).
+    measurement_hashes — хэши собственных измерений, которые модель уже учла:
+    update считает новыми только измерения вне этого набора.
+    Возвращает идентификатор версии.
+    """
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".staging_", dir=REGISTRY_DIR)
+    try:
+        joblib.dump(pipeline, os.path.join(tmp_dir, ARTIFACT_FILE))
+        _write_serving_artifact(pipeline, tmp_dir)
+        if holdout is not None:
+            holdout.to_csv(os.path.join(tmp_dir, HOLDOUT_FILE), index=False)
+        if measurement_hashes is not None:
+            with open(os.path.join(tmp_dir, MEASUREMENTS_FILE), "w", encoding="utf-8") as f:
+                f.writelines(f"{h}\n" for h in sorted(measurement_hashes))
+
+        for _ in range(MAX_REGISTER_ATTEMPTS):
+            version = f"v{_next_version_number():04d}"
+            metadata = {
+                "version": version,
+                "model_name": model_name,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "metrics": metrics,
+                "feature_schema": feature_schema,
+                "data_hash": data_hash,
+                "training_time_sec": training_time,
+                "parent": parent,
+                "holdout_group_by": holdout_group_by,
+            }
+            with open(os.path.join(tmp_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            try:
+                os.rename(tmp_dir, os.path.join(REGISTRY_DIR, version))
+                break
+            except OSError as e:
+                # Версию с таким номером успел создать другой процесс — берём следующий.
+                # Любая другая ошибка (например, нет прав) пробрасывается сразу.
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                    raise
+        else:
+            raise RuntimeError(
+                f"Не удалось выделить номер версии в {REGISTRY_DIR} за {MAX_REGISTER_ATTEMPTS} попыток"
+            )
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    print(f"📦 Модель зарегистрирована как версия {version}")
+    return version
+
+
+def promote(version):
+    """Атомарно переключает pointer-файл на указанную версию."""
+    if not os.path.exists(os.path.join(REGISTRY_DIR, version, ARTIFACT_FILE)):
+        raise FileNotFoundError(f"Версия '{version}' не найдена в реестре {REGISTRY_DIR}")
+
+    with _pointer_lock():
+        pointer = _read_pointer()
+        if pointer["current"] == version:
+            return version
+        history = pointer["history"] + ([pointer["current"]] if pointer["current"] else [])
+        _atomic_write_json(os.path.join(REGISTRY_DIR, POINTER_FILE), {"current": version, "history": history})
+    print(f"🚀 Активная версия модели: {version}")
+    return version
+
+
+def rollback():
+    """Возвращает pointer-файл на предыдущую активную версию."""
+    with _pointer_lock():
+        pointer = _read_pointer()
+        if not pointer["history"]:
+            raise ValueError("Нет предыдущей версии для отката.")
+
+        version = pointer["history"][-1]
+        _atomic_write_json(
+            os.path.join(REGISTRY_DIR, POINTER_FILE),
+            {"current": version, "history": pointer["history"][:-1]}
+        )
+    print(f"↩️ Откат на версию модели: {version}")
+    return version
+
+
+def load_metadata(version=None):
+    version = version or current_version()
+    if version is None:
+        return None
+    with open(os.path.join(REGISTRY_DIR, version, METADATA_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_holdout(version=None):
+    """Отложенная выборка версии или None, если версия сохранена без неё."""
+    version = version or current_version()
+    if version is None:
+        return None
+    path = os.path.join(REGISTRY_DIR, version, HOLDOUT_FILE)
+    if not os.path.exists(path):
+        return None
+    # round_trip: значения читаются в точности такими, какими записаны (строки сравниваются по хэшам)
+    return pd.read_csv(path, float_precision="round_trip")
+
+
+def load_measurement_hashes(version=None):
+    """
+    Хэши собственных измерений, учтённых версией, или None, если версия
+    сохранена без них (до появления measurements.txt).
+    """
+    version = version or current_version()
+    if version is None:
+        return None
+    path = os.path.join(REGISTRY_DIR, version, MEASUREMENTS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_model(version=None, mmap_mode="r"):
+    """
+    Загружает активную (или указанную) версию модели.
+
+    С mmap_mode='r' для RandomForest/GradientBoosting загружается serving.joblib,
+    а узлы деревьев отображаются в память: это модель только для предсказаний,
+    разделяемая процессами через page cache. Остальные модели загружаются из
+    model.joblib через joblib с mmap_mode; общие страницы возможны только для
+    массивов, которые модель хранит как обычные NumPy-атрибуты, а бустеры
+    LightGBM/XGBoost копируются в каждый процесс.
+    С mmap_mode=None загружается полная модель (нужна для дообучения).
+    Если реестр пуст, загружается старый файл models/best_model.pkl.
+    """
+    version = version or current_version()
+    if version is None:
+        return joblib.load(LEGACY_MODEL_PATH)
+
+    version_dir = os.path.join(REGISTRY_DIR, version)
+    serving_path = os.path.join(version_dir, SERVING_FILE)
+    if mmap_mode is not None and os.path.exists(serving_path):
+        serving = joblib.load(serving_path)
+        serving.named_steps["regressor"].attach(os.path.join(version_dir, TREES_DIR), mmap_mode=mmap_mode)
+        return serving
+    return joblib.load(os.path.join(version_dir, ARTIFACT_FILE), mmap_mode=mmap_mode)
@@ -1,71 +1,240 @@
 # src/models/solubility_model.py
+import copy
 import joblib
+import numpy as np
 import pandas as pd
 import os
+import shutil
+import tempfile
 import time
+from joblib import Parallel, delayed
 
 # --- 1. Импортируем все регрессоры, которые хотим протестировать ---
-from sklearn.linear_model import LinearRegression, Lasso, Ridge
+from sklearn.linear_model import LinearRegression, Lasso, Ridge, SGDRegressor
 from sklearn.neighbors import KNeighborsRegressor
 from sklearn.svm import SVR
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from xgboost import XGBRegressor
 from lightgbm import LGBMRegressor
 
-from sklearn.model_selection import train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import GroupKFold, GroupShuffleSplit, train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 
+from src.models import registry
 
-def train_and_evaluate_models(df):
-    """
-    Обучает большой набор регрессоров, сравнивает их и сохраняет лучшую модель.
-    """
-    print("📥 Подготовка данных для обучения...")
 
-    # Разделяем признаки на числовые и категориальные для правильной обработки
-    categorical_features = ['solvent']
-    numerical_features = ['temperature_k', 'mol_weight', 'logp', 'tpsa', 'h_donors', 'h_acceptors']
+FEATURES_PATH = "data/processed/solubility_with_features.csv"
 
-    X = df[categorical_features + numerical_features].dropna()
-    y = df.loc[X.index]['log_s']
+# Столбец отложенной выборки с меткой группы (соединение или скаффолд) каждой строки
+HOLDOUT_GROUP_COLUMN = 'group'
 
-    print(f"🧮 Используемые признаки: {categorical_features + numerical_features}")
+# Разделяем признаки на числовые и категориальные для правильной обработки
+CATEGORICAL_FEATURES = ['solvent']
+NUMERICAL_FEATURES = ['temperature_k', 'mol_weight', 'logp', 'tpsa', 'h_donors', 'h_acceptors']
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-    # --- 2. Определяем общий препроцессор с масштабированием! ---
-    # OneHotEncoder для категорий и StandardScaler для чисел.
-    # Это КРИТИЧЕСКИ ВАЖНО для линейных моделей, SVR и KNN.
-    preprocessor = ColumnTransformer(
+def _build_preprocessor():
+    """
+    Общий препроцессор: OneHotEncoder для категорий и StandardScaler для чисел.
+    Это КРИТИЧЕСКИ ВАЖНО для линейных моделей, SVR и KNN.
+    """
+    return ColumnTransformer(
         transformers=[
-            ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features),
-            ('scaler', StandardScaler(), numerical_features)
+            ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False), CATEGORICAL_FEATURES),
+            ('scaler', StandardScaler(), NUMERICAL_FEATURES)
         ],
         remainder='passthrough'  # На случай, если появятся другие столбцы
     )
 
-    # --- 3. Определяем большой словарь моделей для тестирования ---
-    models = {
+
+def _build_models(n_jobs=-1):
+    """
+    Большой словарь моделей для тестирования.
+    n_jobs задаёт внутренний параллелизм ансамблей (1 — при внешнем параллелизме).
+    """
+    return {
         "LinearRegression": LinearRegression(),
         "Lasso": Lasso(random_state=42),
         "Ridge": Ridge(random_state=42),
         "KNeighborsRegressor": KNeighborsRegressor(),
         "SVR": SVR(),
-        "RandomForest": RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
+        "RandomForest": RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs),
         "GradientBoosting": GradientBoostingRegressor(n_estimators=100, random_state=42),
-        "XGBoost": XGBRegressor(n_estimators=100, random_state=42, n_jobs=-1),
-        "LightGBM": LGBMRegressor(n_estimators=100, random_state=42, n_jobs=-1, verbose=-1)
+        "XGBoost": XGBRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs),
+        "LightGBM": LGBMRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs, verbose=-1),
+        # Линейная модель с partial_fit: единственная из линейных, которую можно дообучать
+        "SGDRegressor": SGDRegressor(random_state=42)
     }
 
+
+def _make_groups(df, group_by):
+    """Метки групп для GroupKFold: по соединению (SMILES) или по скаффолду Мурко."""
+    if group_by == 'compound':
+        return df['smiles'].astype(str).values
+    if group_by == 'scaffold':
+        from src.features.smiles_featurizer import calculate_scaffold
+        # Скаффолд считаем один раз на уникальный SMILES
+        unique_smiles = df['smiles'].astype(str).unique()
+        scaffolds = {smi: calculate_scaffold(smi) for smi in unique_smiles}
+        return df['smiles'].astype(str).map(scaffolds).values
+    raise ValueError(f"Неизвестный способ группировки: {group_by!r} (ожидается 'compound' или 'scaffold')")
+
+
+def _evaluate_fold(name, data_path, fold, start, end):
+    """
+    Обучает одну модель на одном фолде. Выполняется в рабочем процессе.
+
+    Матрица признаков отображается из memmap-файла, строки в нём упорядочены
+    по фолдам: тестовая часть [start, end) — это срез без копирования, а
+    обучающая собирается из двух соседних срезов одним копированием
+    (оценщикам sklearn нужна одна непрерывная матрица).
+    """
+    start_time = time.time()
+    X_values, y_values = joblib.load(data_path, mmap_mode='r')
+    columns = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+
+    X_train = pd.DataFrame(np.concatenate([X_values[:start], X_values[end:]]), columns=columns, copy=False)
+    y_train = np.concatenate([y_values[:start], y_values[end:]])
+    X_test = pd.DataFrame(X_values[start:end], columns=columns, copy=False)
+    y_test = y_values[start:end]
+
+    pipeline = Pipeline([
+        ('preprocessor', _build_preprocessor()),
+        ('regressor', _build_models(n_jobs=1)[name])
+    ])
+    pipeline.fit(X_train, y_train)
+    y_pred = pipeline.predict(X_test)
+
+    return {
+        "Модель": name,
+        "Фолд": fold,
+        "MAE": mean_absolute_error(y_test, y_pred),
+        "R²": r2_score(y_test, y_pred),
+        "Время (сек)": time.time() - start_time
+    }
+
+
+def _check_cv_folds(n_splits, groups):
+    """GroupKFold требует, чтобы групп было не меньше, чем фолдов."""
+    n_groups = len(np.unique(groups))
+    if n_splits > n_groups:
+        raise ValueError(
+            f"--cv {n_splits}: для групповой кросс-валидации доступно только {n_groups} групп. "
+            f"Уменьшите число фолдов до {n_groups} или меньше."
+        )
+
+
+def cross_validate_models(df, n_splits=5, group_by='compound', n_jobs=-1, groups=None):
+    """
+    Групповая k-fold кросс-валидация всех моделей.
+
+    Одно соединение (или скаффолд) никогда не попадает одновременно в обучение
+    и тест. Пары (фолд, модель) обучаются параллельно в отдельных процессах.
+    Общая матрица признаков записывается один раз и отображается в каждый
+    процесс через memmap; каждая задача копирует только свою обучающую часть.
+    groups — уже посчитанные метки групп для строк df (иначе считаются по group_by).
+    Возвращает (таблица по фолдам, сводная таблица).
+    """
+    print(f"📥 Подготовка данных для {n_splits}-fold CV (группировка: {group_by})...")
+    wall_start = time.time()
+
+    complete = df[CATEGORICAL_FEATURES + NUMERICAL_FEATURES].notna().all(axis=1).to_numpy()
+    X = df.loc[complete, CATEGORICAL_FEATURES + NUMERICAL_FEATURES]
+    y = df.loc[complete, 'log_s']
+    if groups is None:
+        groups = _make_groups(df.loc[complete], group_by)
+    else:
+        groups = np.asarray(groups)[complete]
+    _check_cv_folds(n_splits, groups)
+
+    # Кодируем растворитель целым числом, чтобы вся матрица была числовой
+    # и могла отображаться в память; OneHotEncoder работает с кодами так же.
+    solvent_codes, _ = pd.factorize(X['solvent'])
+    X_values = np.column_stack([solvent_codes, X[NUMERICAL_FEATURES].to_numpy(dtype=np.float64)])
+    y_values = y.to_numpy(dtype=np.float64)
+
+    splits = list(GroupKFold(n_splits=n_splits).split(X_values, y_values, groups))
+    # Переставляем строки так, чтобы тест каждого фолда был непрерывным блоком
+    test_blocks = [test_idx for _, test_idx in splits]
+    order = np.concatenate(test_blocks)
+    X_values, y_values = X_values[order], y_values[order]
+    bounds = np.cumsum([0] + [len(block) for block in test_blocks])
+    model_names = list(_build_models().keys())
+
+    tmp_dir = tempfile.mkdtemp(prefix="solubility_cv_")
+    data_path = os.path.join(tmp_dir, "features.joblib")
+    try:
+        joblib.dump((X_values, y_values), data_path)
+        fold_results = Parallel(n_jobs=n_jobs, backend='loky')(
+            delayed(_evaluate_fold)(name, data_path, fold, int(bounds[fold]), int(bounds[fold + 1]))
+            for fold in range(n_splits)
+            for name in model_names
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    folds_df = pd.DataFrame(fold_results).sort_values(by=["Модель", "Фолд"]).reset_index(drop=True)
+    summary_df = (
+        folds_df.groupby("Модель")
+        .agg(**{
+            "MAE": ("MAE", "mean"),
+            "MAE std": ("MAE", "std"),
+            "R²": ("R²", "mean"),
+            "R² std": ("R²", "std"),
+            "Время (сек)": ("Время (сек)", "sum"),
+        })
+        .sort_values(by="MAE")
+        .reset_index()
+    )
+
+    print("\n\n--- 📊 Результаты по фолдам ---")
+    print(folds_df.to_string())
+    print("\n\n--- 📊 Сводная таблица кросс-валидации ---")
+    print(summary_df.to_string())
+    print(f"\n⏱️ Общее время кросс-валидации: {time.time() - wall_start:.2f} сек")
+
+    return folds_df, summary_df
+
+
+def train_and_evaluate_models(df, cv_folds=None, group_by='compound', n_jobs=-1, measurement_hashes=None):
+    """
+    Обучает большой набор регрессоров, сравнивает их и сохраняет лучшую модель.
+
+    По умолчанию модели сравниваются на одном случайном разбиении 80/20.
+    Если задан cv_folds, сначала откладывается групповая выборка 20%, на остальных
+    данных выполняется групповая кросс-валидация (см. cross_validate_models),
+    и лучшая модель переобучается на всех неотложенных данных.
+    Отложенная выборка сохраняется вместе с версией модели в реестре.
+    measurement_hashes — хэши собственных измерений, вошедших в df
+    (записываются в версию, см. select_new_measurements).
+    """
+    if cv_folds:
+        return _train_with_cross_validation(df, cv_folds, group_by, n_jobs, measurement_hashes)
+
+    print("📥 Подготовка данных для обучения...")
+
+    X = df[CATEGORICAL_FEATURES + NUMERICAL_FEATURES].dropna()
+    y = df.loc[X.index]['log_s']
+
+    print(f"🧮 Используемые признаки: {CATEGORICAL_FEATURES + NUMERICAL_FEATURES}")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    preprocessor = _build_preprocessor()
+    models = _build_models()
+
     results = []
     best_mae = float('inf')
+    best_r2 = None
+    best_training_time = None
     best_model_pipeline = None
     best_model_name = ""
 
-    # --- 4. Обучаем и оцениваем каждую модель в цикле ---
+    # --- Обучаем и оцениваем каждую модель в цикле ---
     for name, model in models.items():
         print(f"\n--- Обучение модели: {name} ---")
         start_time = time.time()
@@ -95,38 +264,335 @@ def train_and_evaluate_models(df):
 
         if mae < best_mae:
             best_mae = mae
+            best_r2 = r2
+            best_training_time = training_time
             best_model_pipeline = pipeline
             best_model_name = name
 
-    # --- 5. Выводим красивую итоговую таблицу ---
+    # --- Выводим красивую итоговую таблицу ---
     results_df = pd.DataFrame(results).sort_values(by="MAE").reset_index(drop=True)
     print("\n\n--- 📊 Сводная таблица результатов ---")
     print(results_df.to_string())
 
-    # --- 6. Сохраняем только лучшую модель ---
+    # --- Сохраняем только лучшую модель ---
     print(f"\n🏆 Лучшая модель по метрике MAE: {best_model_name} (MAE = {best_mae:.3f})")
+    _save_best_model(
+        best_model_pipeline, best_model_name,
+        metrics={"mae": best_mae, "r2": best_r2, "evaluation": "holdout_20"},
+        feature_schema=_feature_schema(X_train), data_hash=registry.compute_data_hash(X_train, y_train),
+        training_time=best_training_time, holdout=X_test.assign(log_s=y_test),
+        holdout_group_by='row', measurement_hashes=measurement_hashes
+    )
+
+    return best_model_pipeline
+
+
+def _train_with_cross_validation(df, cv_folds, group_by, n_jobs, measurement_hashes=None):
+    """
+    Откладывает групповую выборку 20%, выбирает модель по средней MAE на групповой
+    CV по остальным данным и обучает её на всех неотложенных данных.
+    """
+    X = df[CATEGORICAL_FEATURES + NUMERICAL_FEATURES].dropna()
+    y = df.loc[X.index]['log_s']
+
+    # Отложенная выборка с той же группировкой, что и CV: по ней проверяются
+    # инкрементальные обновления (update_model), поэтому в обучение она не попадает
+    groups = _make_groups(df.loc[X.index], group_by)
+    train_idx, holdout_idx = next(
+        GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42).split(X, y, groups)
+    )
+    X_train, y_train = X.iloc[train_idx], y.iloc[train_idx]
+    X_holdout, y_holdout = X.iloc[holdout_idx], y.iloc[holdout_idx]
+    print(f"📤 Отложено {len(X_holdout)} строк (группировка: {group_by})")
+    # Проверяем до кросс-валидации, чтобы не тратить время на обучение
+    _check_cv_folds(cv_folds, groups[train_idx])
+
+    # Метки групп (для скаффолдов — дорогие вызовы RDKit) переиспользуются в CV
+    folds_df, summary_df = cross_validate_models(
+        df.loc[X_train.index], n_splits=cv_folds, group_by=group_by, n_jobs=n_jobs, groups=groups[train_idx]
+    )
 
-    os.makedirs("models", exist_ok=True)
-    model_path = "models/best_model.pkl"
-    joblib.dump(best_model_pipeline, model_path)
-    print(f"💾 Лучшая модель сохранена в: {model_path}")
+    os.makedirs("reports", exist_ok=True)
+    folds_df.to_csv("reports/cv_folds.csv", index=False)
+    summary_df.to_csv("reports/cv_summary.csv", index=False)
+    print("💾 Результаты кросс-валидации сохранены в reports/cv_folds.csv и reports/cv_summary.csv")
+
+    best_row = summary_df.iloc[0]
+    best_model_name = best_row["Модель"]
+    print(f"\n🏆 Лучшая модель по средней MAE: {best_model_name} "
+          f"(MAE = {best_row['MAE']:.3f} ± {best_row['MAE std']:.3f})")
+
+    print(f"🔁 Обучение {best_model_name} на всех неотложенных данных...")
+    start_time = time.time()
+    best_model_pipeline = Pipeline([
+        ('preprocessor', _build_preprocessor()),
+        ('regressor', _build_models(n_jobs=n_jobs)[best_model_name])
+    ])
+    best_model_pipeline.fit(X_train, y_train)
+    training_time = time.time() - start_time
+
+    y_pred = best_model_pipeline.predict(X_holdout)
+    holdout_mae = mean_absolute_error(y_holdout, y_pred)
+    holdout_r2 = r2_score(y_holdout, y_pred)
+    print(f"✅ Отложенная выборка: MAE = {holdout_mae:.3f}, R² = {holdout_r2:.3f}")
+
+    _save_best_model(
+        best_model_pipeline, best_model_name,
+        metrics={
+            "mae": holdout_mae,
+            "r2": holdout_r2,
+            "cv_mae": best_row["MAE"],
+            "cv_mae_std": best_row["MAE std"],
+            "cv_r2": best_row["R²"],
+            "evaluation": f"group_holdout_20_{group_by}+group_kfold_{cv_folds}",
+        },
+        feature_schema=_feature_schema(X_train), data_hash=registry.compute_data_hash(X_train, y_train),
+        training_time=training_time,
+        holdout=X_holdout.assign(log_s=y_holdout, **{HOLDOUT_GROUP_COLUMN: groups[holdout_idx]}),
+        holdout_group_by=group_by, measurement_hashes=measurement_hashes
+    )
 
     return best_model_pipeline
 
 
+def _feature_schema(X):
+    return {
+        "categorical": CATEGORICAL_FEATURES,
+        "numerical": NUMERICAL_FEATURES,
+        "dtypes": {col: str(dtype) for col, dtype in X.dtypes.items()},
+    }
+
+
+def _save_best_model(pipeline, model_name, metrics, feature_schema, data_hash, training_time, holdout, parent=None,
+                     holdout_group_by=None, measurement_hashes=None):
+    """Регистрирует модель новой версией в реестре и атомарно делает её активной."""
+    version = registry.register_model(
+        pipeline,
+        model_name=model_name,
+        metrics={k: (v.item() if isinstance(v, np.generic) else v) for k, v in metrics.items()},
+        feature_schema=feature_schema,
+        data_hash=data_hash,
+        training_time=float(training_time),
+        holdout=holdout,
+        parent=parent,
+        holdout_group_by=holdout_group_by,
+        measurement_hashes=measurement_hashes,
+    )
+    registry.promote(version)
+    print(f"💾 Лучшая модель сохранена в реестре: {registry.REGISTRY_DIR}/{version}")
+    return version
+
+
+def _row_hashes(df):
+    """Хэши строк по признакам и logS: так находятся точные копии строк отложенной выборки."""
+    columns = df[CATEGORICAL_FEATURES + NUMERICAL_FEATURES + ['log_s']].astype(
+        {col: 'float64' for col in NUMERICAL_FEATURES + ['log_s']}
+    ).astype({col: str for col in CATEGORICAL_FEATURES})
+    return pd.util.hash_pandas_object(columns, index=False)
+
+
+def _holdout_overlap(df, holdout, group_by):
+    """
+    Маски строк df, пересекающихся с отложенной выборкой:
+    (строки из её групп, точные копии её строк).
+
+    group_by — группировка, по которой выборка отложена. Для 'row' (случайное
+    разбиение строк) и старых выборок без меток групп проверяются только копии.
+    """
+    copies = _row_hashes(df).isin(set(_row_hashes(holdout))).to_numpy()
+    if group_by in ('compound', 'scaffold') and HOLDOUT_GROUP_COLUMN in holdout.columns:
+        holdout_groups = holdout[HOLDOUT_GROUP_COLUMN].astype(str).unique()
+        in_groups = np.isin(_make_groups(df, group_by), holdout_groups) & ~copies
+    else:
+        in_groups = np.zeros(len(df), dtype=bool)
+    return in_groups, copies
+
+
+def _continue_training(regressor, X_new, y_new, n_new_estimators):
+    """
+    Дообучает регрессор только на новых (уже преобразованных) данных.
+    Возвращает (новый регрессор, способ) или (None, None), если модель
+    не поддерживает дообучение.
+    """
+    if isinstance(regressor, LGBMRegressor):
+        # Продолженный бустинг: новые деревья строятся поверх существующего бустера
+        updated = clone(regressor).set_params(n_estimators=n_new_estimators)
+        updated.fit(X_new, y_new, init_model=regressor.booster_)
+        return updated, "continued boosting (LightGBM)"
+
+    if isinstance(regressor, XGBRegressor):
+        updated = clone(regressor).set_params(n_estimators=n_new_estimators)
+        updated.fit(X_new, y_new, xgb_model=regressor.get_booster())
+        return updated, "continued boosting (XGBoost)"
+
+    if isinstance(regressor, (RandomForestRegressor, GradientBoostingRegressor)):
+        # warm_start добавляет новые деревья, не трогая уже обученные
+        updated = copy.deepcopy(regressor)
+        updated.set_params(warm_start=True, n_estimators=regressor.n_estimators + n_new_estimators)
+        updated.fit(X_new, y_new)
+        return updated, "warm start"
+
+    if hasattr(regressor, "partial_fit"):
+        updated = copy.deepcopy(regressor)
+        updated.partial_fit(X_new, y_new)
+        return updated, "partial_fit"
+
+    return None, None
+
+
+def update_model(new_df, n_new_estimators=50, tolerance=0.0, measurement_hashes=None):
+    """
+    Инкрементально обновляет сохранённую лучшую модель на новых измерениях.
+
+    new_df должен содержать молекулярные признаки (см. featurize_compounds).
+    Препроцессор не переобучается; регрессор дообучается только на новых строках,
+    если библиотека это поддерживает (LightGBM, XGBoost, RandomForest,
+    GradientBoosting, SGDRegressor). LinearRegression, Lasso, Ridge, KNN и SVR
+    дообучаться не умеют и всегда переобучаются целиком на кэше признаков и
+    новых строках (без повторной генерации дескрипторов), поэтому для них время
+    обновления растёт с размером всего датасета. Новая версия регистрируется и
+    становится активной, только если MAE на отложенной выборке активной версии
+    не ухудшилась больше чем на tolerance.
+
+    Новые строки из групп отложенной выборки (та же группировка, что при её
+    создании) не используются для обучения, а добавляются в отложенную выборку;
+    точные копии её строк отбрасываются. Иначе модель проверялась бы на данных,
+    на которых только что обучилась.
+    measurement_hashes — хэши собственных измерений, учтённых новой версией.
+    Возвращает словарь с метриками до и после обновления.
+    """
+    parent = registry.current_version()
+    if parent is None:
+        raise FileNotFoundError("Активная модель не найдена в реестре. Сначала запустите обучение.")
+
+    # Отложенная выборка хранится вместе с версией: это строки, которые
+    # именно эта модель (и её предки) не видела при обучении
+    holdout = registry.load_holdout(parent)
+    if holdout is None:
+        raise FileNotFoundError(
+            f"У версии {parent} нет сохранённой отложенной выборки. "
+            "Переобучите модель командой train."
+        )
+
+    parent_metadata = registry.load_metadata(parent)
+    # Версии без этого поля созданы train без --cv, т.е. случайным разбиением строк
+    group_by = parent_metadata.get("holdout_group_by") or 'row'
+
+    new_df = new_df.dropna(subset=CATEGORICAL_FEATURES + NUMERICAL_FEATURES)
+    if new_df.empty:
+        raise ValueError("Нет новых строк с полным набором признаков для обновления модели.")
+
+    in_groups, copies = _holdout_overlap(new_df, holdout, group_by)
+    if copies.any():
+        print(f"🗑️  Копий строк отложенной выборки отброшено: {copies.sum()}")
+    if in_groups.any():
+        print(f"📤 Строк из групп отложенной выборки ({group_by}) добавлено в неё, а не в обучение: {in_groups.sum()}")
+        holdout = pd.concat([holdout, new_df.loc[in_groups, holdout.columns.intersection(new_df.columns)]
+                             .assign(**{HOLDOUT_GROUP_COLUMN: _make_groups(new_df[in_groups], group_by)})],
+                            ignore_index=True)
+
+    train_rows = new_df[~(in_groups | copies)]
+    X_new = train_rows[CATEGORICAL_FEATURES + NUMERICAL_FEATURES]
+    y_new = train_rows['log_s']
+    if X_new.empty:
+        print("⛔ Все новые строки относятся к отложенной выборке, дообучать модель не на чем.")
+        return {"method": None, "n_new_rows": 0, "swapped": False}
+
+    # Без mmap: дообучение изменяет массивы модели
+    pipeline = registry.load_model(parent, mmap_mode=None)
+    X_holdout = holdout[CATEGORICAL_FEATURES + NUMERICAL_FEATURES]
+    y_holdout = holdout['log_s']
+
+    print(f"📥 Новых строк для обновления: {len(X_new)}")
+    start_time = time.time()
+
+    preprocessor = pipeline.named_steps['preprocessor']
+    regressor = pipeline.named_steps['regressor']
+    updated_regressor, method = _continue_training(
+        regressor, preprocessor.transform(X_new), y_new, n_new_estimators
+    )
+
+    if updated_regressor is not None:
+        updated_pipeline = Pipeline([
+            ('preprocessor', preprocessor),
+            ('regressor', updated_regressor)
+        ])
+    else:
+        method = "full refit on cached features"
+        print(f"⚠️ {type(regressor).__name__} не поддерживает дообучение, переобучение на {FEATURES_PATH}...")
+        cached = pd.read_csv(
+            FEATURES_PATH, usecols=['smiles'] + CATEGORICAL_FEATURES + NUMERICAL_FEATURES + ['log_s'],
+            float_precision='round_trip'
+        )
+        cached = cached.dropna(subset=CATEGORICAL_FEATURES + NUMERICAL_FEATURES)
+        # Строки отложенной выборки и её групп не должны попасть в обучение
+        in_groups, copies = _holdout_overlap(cached, holdout, group_by)
+        cached = cached[~(in_groups | copies)]
+        X_full = pd.concat([cached[CATEGORICAL_FEATURES + NUMERICAL_FEATURES], X_new], ignore_index=True)
+        y_full = pd.concat([cached['log_s'], y_new], ignore_index=True).loc[X_full.index]
+        updated_pipeline = Pipeline([
+            ('preprocessor', _build_preprocessor()),
+            ('regressor', clone(regressor))
+        ])
+        updated_pipeline.fit(X_full, y_full)
+
+    update_time = time.time() - start_time
+
+    old_pred = pipeline.predict(X_holdout)
+    new_pred = updated_pipeline.predict(X_holdout)
+    metrics = {
+        "method": method,
+        "n_new_rows": len(X_new),
+        "old_mae": mean_absolute_error(y_holdout, old_pred),
+        "new_mae": mean_absolute_error(y_holdout, new_pred),
+        "old_r2": r2_score(y_holdout, old_pred),
+        "new_r2": r2_score(y_holdout, new_pred),
+        "update_time": update_time,
+    }
+
+    print(f"✅ {type(regressor).__name__} ({method}): "
+          f"MAE {metrics['old_mae']:.3f} → {metrics['new_mae']:.3f}, "
+          f"R² {metrics['old_r2']:.3f} → {metrics['new_r2']:.3f}, "
+          f"Время = {update_time:.2f} сек")
+
+    metrics["swapped"] = metrics["new_mae"] <= metrics["old_mae"] + tolerance
+    if metrics["swapped"]:
+        # Версия-наследник описывает всю историю данных, а не только новые строки:
+        # имя модели и схема признаков берутся у родителя, хэш данных сцепляется с его хэшем
+        metrics["version"] = _save_best_model(
+            updated_pipeline, parent_metadata["model_name"],
+            metrics={
+                "mae": metrics["new_mae"],
+                "r2": metrics["new_r2"],
+                "evaluation": "parent_holdout",
+                "update_method": method,
+                "n_new_rows": len(X_new),
+            },
+            feature_schema=parent_metadata["feature_schema"],
+            data_hash=registry.chain_data_hash(parent_metadata["data_hash"], X_new, y_new),
+            training_time=update_time, holdout=holdout, parent=parent,
+            holdout_group_by=group_by, measurement_hashes=measurement_hashes
+        )
+    else:
+        print("⛔ Метрики ухудшились, сохранённая модель оставлена без изменений.")
+
+    return metrics
+
+
 def predict_optimal_conditions(smiles, temp_range=(273, 350), solvents=None):
     """
-    Эта функция остается БЕЗ ИЗМЕНЕНИЙ. Она просто загружает
-    лучшую модель, какой бы она ни была.
+    Загружает активную версию лучшей модели из реестра, какой бы она ни была.
+    Для RandomForest и GradientBoosting узлы деревьев отображаются в память
+    (см. registry.load_model), и параллельные процессы-предсказатели разделяют
+    одну копию через page cache.
     """
     if solvents is None:
         solvents = ["O", "CCO", "CC(C)O", "C1CCOC1", "CS(C)=O"]
 
-    model_path = "models/best_model.pkl"
     try:
-        model = joblib.load(model_path)
+        model = registry.load_model(mmap_mode='r')
     except FileNotFoundError:
-        return f"❌ Файл лучшей модели '{model_path}' не найден. Сначала запустите обучение."
+        return f"❌ Активная модель в реестре '{registry.REGISTRY_DIR}' не найдена. Сначала запустите обучение."
     except Exception as e:
         return f"❌ Ошибка загрузки модели: {e}"
 
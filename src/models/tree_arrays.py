@@ -0,0 +1,108 @@
+# src/models/tree_arrays.py
+import os
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+
+# Признак листа в sklearn.tree._tree
+TREE_LEAF = -1
+
+ARRAY_NAMES = ("left", "right", "feature", "threshold", "value", "roots")
+
+
+class MmapTreeEnsemble(RegressorMixin, BaseEstimator):
+    """
+    Регрессор для предсказаний по деревьям RandomForest/GradientBoosting,
+    узлы которых лежат в .npy-файлах и отображаются в память (mmap).
+
+    sklearn при распаковке дерева (Tree.__setstate__) копирует узлы в свою
+    память, поэтому joblib.load(..., mmap_mode='r') не даёт общих страниц.
+    Здесь обход деревьев выполняется NumPy-индексацией прямо по отображённым
+    массивам, и все процессы на хосте читают одни и те же страницы page cache.
+    Только для предсказаний: обучение и дообучение идут по исходной модели.
+    """
+
+    def __init__(self, scale=1.0, offset=0.0, max_depth=0):
+        self.scale = scale
+        self.offset = offset
+        self.max_depth = max_depth
+
+    def fit(self, X, y):
+        raise TypeError("MmapTreeEnsemble используется только для предсказаний; обучайте исходную модель.")
+
+    def __sklearn_is_fitted__(self):
+        return all(hasattr(self, name) for name in ARRAY_NAMES)
+
+    def __getstate__(self):
+        # Массивы хранятся отдельными .npy-файлами, в pickle попадают только параметры
+        state = super().__getstate__()
+        for name in ARRAY_NAMES:
+            state.pop(name, None)
+        return state
+
+    def attach(self, array_dir, mmap_mode="r"):
+        """Подключает массивы узлов из array_dir (по умолчанию — через mmap)."""
+        for name in ARRAY_NAMES:
+            setattr(self, name, np.load(os.path.join(array_dir, f"{name}.npy"), mmap_mode=mmap_mode))
+        return self
+
+    def predict(self, X):
+        # Деревья sklearn сравнивают признаки, приведённые к float32, с порогами float64
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+
+        # Листья ссылаются сами на себя, поэтому достаточно max_depth шагов для всех деревьев
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.offset + self.scale * self.value[nodes].sum(axis=1)
+
+
+def export_tree_ensemble(regressor):
+    """
+    Переводит RandomForestRegressor или GradientBoostingRegressor в плоские
+    массивы узлов. Возвращает (MmapTreeEnsemble без массивов, словарь массивов)
+    или None, если модель не поддерживается.
+    """
+    if isinstance(regressor, RandomForestRegressor) and regressor.n_outputs_ == 1:
+        trees = [estimator.tree_ for estimator in regressor.estimators_]
+        scale, offset = 1.0 / len(trees), 0.0
+    elif isinstance(regressor, GradientBoostingRegressor) and isinstance(regressor.init_, DummyRegressor):
+        # Для регрессии сырое предсказание GB — это константа init_ плюс сумма деревьев
+        trees = [estimator.tree_ for estimator in regressor.estimators_[:, 0]]
+        scale, offset = regressor.learning_rate, float(np.ravel(regressor.init_.constant_)[0])
+    else:
+        return None
+
+    roots = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+    parts = {name: [] for name in ARRAY_NAMES if name != "roots"}
+    for tree, root in zip(trees, roots):
+        node_ids = np.arange(tree.node_count) + root
+        is_leaf = tree.children_left == TREE_LEAF
+        parts["left"].append(np.where(is_leaf, node_ids, tree.children_left + root))
+        parts["right"].append(np.where(is_leaf, node_ids, tree.children_right + root))
+        parts["feature"].append(np.where(is_leaf, 0, tree.feature))
+        parts["threshold"].append(tree.threshold)
+        parts["value"].append(tree.value[:, 0, 0])
+
+    arrays = {
+        "left": np.concatenate(parts["left"]).astype(np.intp),
+        "right": np.concatenate(parts["right"]).astype(np.intp),
+        "feature": np.concatenate(parts["feature"]).astype(np.intp),
+        "threshold": np.concatenate(parts["threshold"]).astype(np.float64),
+        "value": np.concatenate(parts["value"]).astype(np.float64),
+        "roots": roots.astype(np.intp),
+    }
+    ensemble = MmapTreeEnsemble(scale=scale, offset=offset, max_depth=max(tree.max_depth for tree in trees))
+    return ensemble, arrays
+
+
+def save_arrays(arrays, array_dir):
+    os.makedirs(array_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(array_dir, f"{name}.npy"), np.ascontiguousarray(array))
@@ -0,0 +1,45 @@
+# src/registry.py
+
+import argparse
+
+from src.models import registry
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Управление версиями моделей в реестре.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="Показать все версии и активную")
+    promote_parser = subparsers.add_parser("promote", help="Сделать версию активной")
+    promote_parser.add_argument("version", help="Идентификатор версии, например v0003")
+    subparsers.add_parser("rollback", help="Вернуться к предыдущей активной версии")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Просмотр реестра моделей, переключение и откат активной версии.
+    """
+    args = parse_args(argv)
+
+    if args.command == "list":
+        current = registry.current_version()
+        versions = registry.list_versions()
+        if not versions:
+            print(f"Реестр {registry.REGISTRY_DIR} пуст.")
+            return
+        for meta in versions:
+            marker = "*" if meta["version"] == current else " "
+            mae = meta["metrics"].get("mae")
+            mae_str = f"{mae:.3f}" if mae is not None else "—"
+            print(
+                f"{marker} {meta['version']} | {meta['model_name']:<22} "
+                f"| MAE: {mae_str} | {meta['created_at']} | данные: {meta['data_hash'][:12]}"
+            )
+    elif args.command == "promote":
+        registry.promote(args.version)
+    elif args.command == "rollback":
+        registry.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,62 @@
 # src/train.py
 
+import argparse
+
+from src.data.load_data import load_inhouse_data, measurement_hashes
 from src.data.process import process_solubility_data
 from src.features.smiles_featurizer import featurize_compounds
 # --- ИЗМЕНЕНИЕ 1: Импортируем НОВУЮ функцию ---
-from src.models.solubility_model import train_and_evaluate_models
+from src.models.solubility_model import FEATURES_PATH, train_and_evaluate_models
+
+def _cv_folds(value):
+    folds = int(value)
+    if folds < 2:
+        raise argparse.ArgumentTypeError("число фолдов должно быть не меньше 2")
+    return folds
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Обучение и сравнение моделей растворимости.")
+    parser.add_argument("--cv", type=_cv_folds, default=None, metavar="K",
+                        help="Групповая K-fold кросс-валидация вместо одного разбиения 80/20")
+    parser.add_argument("--group-by", choices=["compound", "scaffold"], default="compound",
+                        help="Группировка для кросс-валидации (по умолчанию: compound)")
+    parser.add_argument("--n-jobs", type=int, default=-1,
+                        help="Число рабочих процессов для кросс-валидации (-1 — все ядра)")
+    return parser.parse_args(argv)
+
 
-def main():
+def main(argv=None):
     """
     Полный пайплайн для подготовки данных, обучения и сравнения моделей.
     """
+    args = parse_args(argv)
     print("🚀 Этап 1: Обучение и сравнение моделей...")
 
     # 1. Загрузка и обработка основного датасета
     print("\n--- Шаг 1: Обработка основного датасета ---")
     df = process_solubility_data()
+    # Собственные измерения, вошедшие в обучение: update не будет применять их повторно
+    df_inhouse = load_inhouse_data()
+    inhouse_hashes = set() if df_inhouse is None else set(measurement_hashes(df_inhouse))
 
     # 2. Генерация молекулярных признаков
     print("\n--- Шаг 2: Генерация молекулярных признаков ---")
     df = featurize_compounds(df)
-    df.to_csv("data/processed/solubility_with_features.csv", index=False)
+    df.to_csv(FEATURES_PATH, index=False)
     print("💾 Данные с фичами сохранены.")
 
     # 3. Обучение, оценка и сохранение лучшей модели
     print("\n--- Шаг 3: Обучение и сравнение моделей ---")
     # --- ИЗМЕНЕНИЕ 2: Вызываем НОВУЮ функцию ---
-    train_and_evaluate_models(df)
+    try:
+        train_and_evaluate_models(
+            df, cv_folds=args.cv, group_by=args.group_by, n_jobs=args.n_jobs,
+            measurement_hashes=inhouse_hashes
+        )
+    except ValueError as e:
+        # Например, фолдов больше, чем групп: сообщение вместо трассировки
+        raise SystemExit(f"❌ {e}")
 
     print("\n✅ Этап обучения и сравнения завершён. Лучшая модель сохранена.")
 
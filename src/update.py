@@ -0,0 +1,83 @@
+# src/update.py
+
+import argparse
+import os
+
+import pandas as pd
+
+from src.data.load_data import (
+    MEASUREMENT_KEY, append_inhouse_data, load_inhouse_data, load_solubility_data, measurement_hashes,
+    select_new_measurements
+)
+from src.data.process import clean_solubility_data
+from src.features.smiles_featurizer import featurize_compounds
+from src.models import registry
+from src.models.solubility_model import FEATURES_PATH, update_model
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Инкрементальное обновление модели на новых измерениях.")
+    parser.add_argument("new_data", help="CSV с новыми измерениями в формате BigSolDBv2.0.csv")
+    parser.add_argument("--n-estimators", type=int, default=50,
+                        help="Сколько деревьев добавить при дообучении ансамблей (по умолчанию: 50)")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Допустимое ухудшение MAE на отложенной выборке (по умолчанию: 0)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Обновляет лучшую модель на новых данных без полного переобучения:
+    признаки считаются только для новых строк. Новыми считаются измерения,
+    которые не учтены активной версией (её measurements.txt), поэтому после
+    отката версии те же измерения можно применить повторно. Измерения попадают
+    в хранилище собственных данных (и затем в полное обучение) только если
+    модель обновлена, и без повторов.
+    """
+    args = parse_args(argv)
+    print("🚀 Инкрементальное обновление модели...")
+
+    # 1. Загрузка и очистка только новых строк
+    print("\n--- Шаг 1: Обработка новых измерений ---")
+    seen_hashes = registry.load_measurement_hashes()
+    if seen_hashes is None:
+        # Версия без measurements.txt: считаем учтённым всё хранилище, как раньше
+        stored = load_inhouse_data()
+        seen_hashes = set() if stored is None else set(measurement_hashes(stored))
+    df_raw = select_new_measurements(load_solubility_data(args.new_data), seen_hashes)
+    if df_raw.empty:
+        print("\n✅ Новых измерений нет. Модель не изменена.")
+        return
+    df_new = clean_solubility_data(df_raw)
+
+    # 2. Генерация признаков только для новых строк
+    print("\n--- Шаг 2: Генерация молекулярных признаков ---")
+    df_new = featurize_compounds(df_new)
+
+    # 3. Дообучение и проверка на отложенной выборке
+    print("\n--- Шаг 3: Дообучение модели ---")
+    metrics = update_model(
+        df_new, n_new_estimators=args.n_estimators, tolerance=args.tolerance,
+        measurement_hashes=seen_hashes | set(measurement_hashes(df_raw))
+    )
+
+    if not metrics["swapped"]:
+        print("\n✅ Обновление завершено. Модель и данные не изменены.")
+        return
+
+    # 4. Сохраняем измерения: сырые строки — в хранилище, которое читает train,
+    #    признаки — в кэш, по которому переобучаются модели без дообучения
+    append_inhouse_data(df_raw)
+    if os.path.exists(FEATURES_PATH):
+        # После отката строки могут уже быть в кэше: дописываем только отсутствующие
+        cached = pd.read_csv(FEATURES_PATH, usecols=MEASUREMENT_KEY, float_precision='round_trip')
+        columns = pd.read_csv(FEATURES_PATH, nrows=0).columns
+        df_new = df_new[~measurement_hashes(df_new).isin(set(measurement_hashes(cached))).to_numpy()]
+        df_new[columns].to_csv(FEATURES_PATH, mode="a", header=False, index=False)
+        print(f"💾 Новые строки добавлены в {FEATURES_PATH}: {len(df_new)}")
+
+    print("\n✅ Обновление завершено. Новая модель сохранена.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
 
+import hashlib
+from contextlib import contextmanager
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import joblib
+from joblib import Parallel, delayed
 
+from src.data.columnar import read_columns
+
+
+def create_eda_report(aggregated=False, dpi=300):
+    """
+    Базовые визуализации по data/processed/solubility_clean.csv.
+    С aggregated=True используется create_eda_report_aggregated
+    (параллельность и кэш настраиваются при прямом вызове).
+    """
+    if aggregated:
+        return create_eda_report_aggregated("data/processed/solubility_clean.csv", density=False, dpi=dpi)
 
-def create_eda_report():
     df = pd.read_csv("data/processed/solubility_clean.csv")
     os.makedirs("reports/figures", exist_ok=True)
 
@@ -17,7 +32,7 @@ def create_eda_report():
     plt.ylabel('Частота')
     plt.axvline(df['log_s'].mean(), color='red', linestyle='--', label=f'Среднее: {df["log_s"].mean():.2f}')
     plt.legend()
-    plt.savefig("reports/figures/logS_distribution.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/logS_distribution.png", dpi=dpi, bbox_inches='tight')
     plt.close()
 
     # 2. Растворимость по растворителям
@@ -30,7 +45,7 @@ def create_eda_report():
     plt.ylabel('logS')
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig("reports/figures/solubility_by_solvent.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/solubility_by_solvent.png", dpi=dpi, bbox_inches='tight')
     plt.close()
 
     # 3. Температурная зависимость
@@ -41,16 +56,21 @@ def create_eda_report():
     plt.xlabel('Температура (K)')
     plt.ylabel('Средний logS')
     plt.grid(alpha=0.3)
-    plt.savefig("reports/figures/solubility_vs_temp.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/solubility_vs_temp.png", dpi=dpi, bbox_inches='tight')
     plt.close()
 
     print("Визуализации сохранены")
 
-def create_eda_report_with_density():
+def create_eda_report_with_density(aggregated=False, dpi=300):
     """
     Создает визуализации на основе обработанных данных,
     включая плотность растворителей.
+    С aggregated=True используется create_eda_report_aggregated
+    (параллельность и кэш настраиваются при прямом вызове).
     """
+    if aggregated:
+        return create_eda_report_aggregated("data/processed/solubility_with_density.csv", density=True, dpi=dpi)
+
     # Загрузка обработанных данных с плотностями
     df = pd.read_csv("data/processed/solubility_with_density.csv")
     os.makedirs("reports/figures", exist_ok=True)
@@ -78,7 +98,7 @@ def create_eda_report_with_density():
                  f'{value:.3f}', ha='center', va='bottom', fontsize=9)
 
     plt.tight_layout()
-    plt.savefig("reports/figures/density_per_solvent.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/density_per_solvent.png", dpi=dpi, bbox_inches='tight')
     plt.close()
     print("  - График плотности по растворителям сохранен.")
 
@@ -96,7 +116,7 @@ def create_eda_report_with_density():
     plt.title('Зависимость растворимости (logS) от плотности растворителя')
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig("reports/figures/solubility_vs_density.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/solubility_vs_density.png", dpi=dpi, bbox_inches='tight')
     plt.close()
     print("  - График logS vs плотность сохранен.")
 
@@ -112,7 +132,7 @@ def create_eda_report_with_density():
     plt.title('Распределение растворимости в группах по плотности')
     plt.xticks(rotation=15)
     plt.tight_layout()
-    plt.savefig("reports/figures/solubility_by_density_category.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/solubility_by_density_category.png", dpi=dpi, bbox_inches='tight')
     plt.close()
     print("  - График logS по категориям плотности сохранен.")
 
@@ -137,9 +157,270 @@ def create_eda_report_with_density():
     plt.legend(title='Растворитель', bbox_to_anchor=(1.05, 1), loc='upper left')
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig("reports/figures/solubility_vs_density_by_solvent.png", dpi=300, bbox_inches='tight')
+    plt.savefig("reports/figures/solubility_vs_density_by_solvent.png", dpi=dpi, bbox_inches='tight')
     plt.close()
     print("  - График logS vs плотность по типам растворителей сохранен.")
 
     print("Все новые визуализации сохранены в reports/figures/")
 
+
+# --- Агрегированный режим для больших датасетов ---
+# Все агрегаты считаются за один проход по нужным столбцам, кэшируются на диске,
+# а фигуры рисуются параллельно по агрегатам, без отрисовки каждой точки.
+
+EDA_CACHE_DIR = "reports/cache"
+# Увеличьте при изменении состава агрегатов, чтобы старый кэш не использовался
+EDA_CACHE_VERSION = 3
+
+DENSITY_CATEGORY_LABELS = ['Очень низкая', 'Низкая', 'Средняя', 'Высокая', 'Очень высокая']
+
+
+@contextmanager
+def _report_style(density):
+    """
+    Стиль отчёта с плотностью, как в create_eda_report_with_density.
+    Применяется в каждой функции отрисовки, т.е. внутри процесса-исполнителя;
+    контекст (а не plt.style.use) не даёт стилю протечь в следующие задачи того же процесса.
+    """
+    if not density:
+        yield
+        return
+    with plt.style.context('seaborn-v0_8-whitegrid'), sns.plotting_context("notebook", font_scale=1.1):
+        yield
+
+
+def _box_stats(values, groups, order):
+    """
+    Статистики для Axes.bxp (квартили и усы 1.5·IQR) по группам, без выбросов.
+    Считаются векторно через groupby, а не по точкам на графике.
+    """
+    grouped = values.groupby(groups, observed=True)
+    quantiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    iqr = quantiles[0.75] - quantiles[0.25]
+    lower = groups.map(quantiles[0.25] - 1.5 * iqr).astype(float)
+    upper = groups.map(quantiles[0.75] + 1.5 * iqr).astype(float)
+    whislo = values[values >= lower].groupby(groups, observed=True).min()
+    whishi = values[values <= upper].groupby(groups, observed=True).max()
+
+    stats = []
+    for label in order:
+        if label not in quantiles.index:
+            continue
+        stats.append({
+            'label': str(label),
+            'q1': quantiles.loc[label, 0.25],
+            'med': quantiles.loc[label, 0.5],
+            'q3': quantiles.loc[label, 0.75],
+            'whislo': whislo.get(label, quantiles.loc[label, 0.25]),
+            'whishi': whishi.get(label, quantiles.loc[label, 0.75]),
+            'fliers': [],
+        })
+    return stats
+
+
+def compute_eda_aggregates(data_path, density=False, bins=50):
+    """
+    Считает за один проход по данным агрегаты для отчёта create_eda_report
+    (density=False) или create_eda_report_with_density (density=True):
+    гистограммы (в т.ч. 2D вместо scatter), квантили для boxplot и средние по группам.
+    Столбцы читаются из колоночной копии данных (см. src.data.columnar), если она есть.
+    """
+    if not density:
+        df = read_columns(data_path, ['log_s', 'solvent', 'temperature_k'])
+        log_s = df['log_s']
+
+        counts, edges = np.histogram(log_s.dropna(), bins=bins)
+        top_solvents = df['solvent'].value_counts().head(10).index
+        in_top = df['solvent'].isin(top_solvents)
+        avg_by_temp = log_s.groupby(df['temperature_k']).mean()
+
+        return {
+            'logs_hist': (counts, edges),
+            'logs_mean': log_s.mean(),
+            'solvent_box': _box_stats(log_s[in_top], df.loc[in_top, 'solvent'], top_solvents),
+            'temp_means': (avg_by_temp.index.to_numpy(), avg_by_temp.to_numpy()),
+        }
+
+    df = read_columns(data_path, ['log_s', 'solvent', 'solvent_smiles', 'density_g_ml'])
+    valid = df.dropna(subset=['density_g_ml', 'log_s'])
+    x, y = valid['density_g_ml'].to_numpy(), valid['log_s'].to_numpy()
+
+    density_per_solvent = df.groupby('solvent_smiles', observed=True)['density_g_ml'].median().sort_values()
+    hist2d, xedges, yedges = np.histogram2d(x, y, bins=bins * 2)
+    slope, intercept = np.polyfit(x, y, 1) if len(x) > 1 else (np.nan, np.nan)
+
+    category = pd.cut(valid['density_g_ml'], bins=5, labels=DENSITY_CATEGORY_LABELS)
+
+    # Средний logS по бинам плотности для каждого из топ-6 растворителей
+    top6 = df['solvent'].value_counts().head(6).index
+    top6_rows = valid[valid['solvent'].isin(top6)]
+    density_bin = pd.cut(top6_rows['density_g_ml'], bins=xedges[::4], include_lowest=True)
+    binned = (
+        top6_rows.groupby(['solvent', density_bin], observed=True)['log_s']
+        .agg(['mean', 'count'])
+        .reset_index()
+    )
+    binned['center'] = binned['density_g_ml'].map(lambda interval: interval.mid).astype(float)
+
+    return {
+        'density_per_solvent': (density_per_solvent.index.to_numpy(), density_per_solvent.to_numpy()),
+        'density_hist2d': (hist2d, xedges, yedges),
+        'density_fit': (slope, intercept),
+        'density_category_box': _box_stats(valid['log_s'], category, DENSITY_CATEGORY_LABELS),
+        'density_by_solvent': {
+            solvent: (group['center'].to_numpy(), group['mean'].to_numpy(), group['count'].to_numpy())
+            for solvent, group in binned.groupby('solvent', observed=True)
+        },
+    }
+
+
+def load_eda_aggregates(data_path, density=False, use_cache=True):
+    """
+    Возвращает агрегаты из кэша, если исходный файл не менялся, иначе считает их заново.
+    Ключ кэша — путь, размер и время изменения файла, поэтому перестилизация
+    графиков не требует повторного чтения данных.
+    """
+    stat = os.stat(data_path)
+    key = f"{os.path.abspath(data_path)}|{stat.st_size}|{stat.st_mtime_ns}|{density}|{EDA_CACHE_VERSION}"
+    cache_path = os.path.join(EDA_CACHE_DIR, f"eda_{hashlib.sha256(key.encode()).hexdigest()[:16]}.joblib")
+
+    if use_cache and os.path.exists(cache_path):
+        print(f"♻️ Агрегаты загружены из кэша: {cache_path}")
+        return joblib.load(cache_path)
+
+    aggregates = compute_eda_aggregates(data_path, density=density)
+    os.makedirs(EDA_CACHE_DIR, exist_ok=True)
+    joblib.dump(aggregates, cache_path)
+    print(f"💾 Агрегаты сохранены в кэш: {cache_path}")
+    return aggregates
+
+
+def _render_logs_distribution(counts, edges, mean, path, dpi):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.stairs(counts, edges, fill=True, color='teal', alpha=0.6)
+    ax.set_title('Распределение растворимости (logS)')
+    ax.set_xlabel('logS (моль/л)')
+    ax.set_ylabel('Частота')
+    ax.axvline(mean, color='red', linestyle='--', label=f'Среднее: {mean:.2f}')
+    ax.legend()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def _render_box(stats, title, xlabel, ylabel, rotation, palette, density, path, dpi, figsize=(12, 6)):
+    with _report_style(density):
+        fig, ax = plt.subplots(figsize=figsize)
+        boxes = ax.bxp(stats, showfliers=False, patch_artist=True)
+        for patch, color in zip(boxes['boxes'], sns.color_palette(palette, len(stats))):
+            patch.set_facecolor(color)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.tick_params(axis='x', labelrotation=rotation)
+        fig.tight_layout()
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
+
+def _render_temp_means(temps, means, path, dpi):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(temps, means, 'o-', linewidth=2)
+    ax.set_title('Средняя растворимость vs Температура')
+    ax.set_xlabel('Температура (K)')
+    ax.set_ylabel('Средний logS')
+    ax.grid(alpha=0.3)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def _render_density_per_solvent(solvents, densities, path, dpi):
+    with _report_style(density=True):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        bars = ax.bar(range(len(densities)), densities, color='skyblue')
+        ax.set_xlabel('Растворитель (SMILES)')
+        ax.set_ylabel('Плотность (г/мл)')
+        ax.set_title('Медианная плотность различных растворителей')
+        ax.set_xticks(range(len(densities)), solvents, rotation=45, ha='right')
+        for bar, value in zip(bars, densities):
+            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.01,
+                    f'{value:.3f}', ha='center', va='bottom', fontsize=9)
+        fig.tight_layout()
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
+
+def _render_density_hist2d(hist2d, xedges, yedges, fit, path, dpi):
+    with _report_style(density=True):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        # Нулевые ячейки маскируем, чтобы фон оставался белым, как у scatter
+        mesh = ax.pcolormesh(xedges, yedges, np.ma.masked_equal(hist2d.T, 0), cmap='Purples')
+        fig.colorbar(mesh, ax=ax, label='Число измерений')
+        slope, intercept = fit
+        if np.isfinite(slope):
+            ax.plot(xedges, slope * xedges + intercept, color='red', linewidth=1)
+        ax.set_xlabel('Плотность растворителя (г/мл)')
+        ax.set_ylabel('logS (моль/л)')
+        ax.set_title('Зависимость растворимости (logS) от плотности растворителя')
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
+
+def _render_density_by_solvent(density_by_solvent, path, dpi):
+    with _report_style(density=True):
+        fig, ax = plt.subplots(figsize=(12, 7))
+        colors = sns.color_palette('tab10', len(density_by_solvent))
+        max_count = max((counts.max() for _, _, counts in density_by_solvent.values()), default=1)
+        for color, (solvent, (centers, means, counts)) in zip(colors, density_by_solvent.items()):
+            # Размер маркера отражает число измерений в бине
+            ax.scatter(centers, means, s=20 + 180 * counts / max_count, color=color, alpha=0.6, label=solvent)
+        ax.set_xlabel('Плотность растворителя (г/мл)')
+        ax.set_ylabel('Средний logS (моль/л)')
+        ax.set_title('Растворимость vs Плотность (цвет = тип растворителя)')
+        ax.legend(title='Растворитель', bbox_to_anchor=(1.05, 1), loc='upper left')
+        ax.grid(True, alpha=0.3)
+        fig.tight_layout()
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
+
+def create_eda_report_aggregated(data_path, density=False, n_jobs=-1, dpi=300, use_cache=True):
+    """
+    Масштабируемая версия create_eda_report (density=False) или
+    create_eda_report_with_density (density=True) для больших датасетов.
+
+    Агрегаты считаются за один проход (или берутся из кэша), затем фигуры
+    рисуются параллельно в отдельных процессах: 2D-гистограммы вместо
+    точечных графиков, boxplot по заранее посчитанным квантилям и средние по группам.
+    Имена файлов совпадают с обычными отчётами.
+    """
+    os.makedirs("reports/figures", exist_ok=True)
+    print("📊 Подсчёт агрегатов для визуализаций...")
+    agg = load_eda_aggregates(data_path, density=density, use_cache=use_cache)
+
+    if not density:
+        counts, edges = agg['logs_hist']
+        jobs = [
+            delayed(_render_logs_distribution)(counts, edges, agg['logs_mean'],
+                                               "reports/figures/logS_distribution.png", dpi),
+            delayed(_render_box)(agg['solvent_box'], 'Растворимость по топ-10 растворителям', 'Растворитель',
+                                 'logS', 45, None, False, "reports/figures/solubility_by_solvent.png", dpi),
+            delayed(_render_temp_means)(*agg['temp_means'], "reports/figures/solubility_vs_temp.png", dpi),
+        ]
+    else:
+        jobs = [
+            delayed(_render_density_per_solvent)(*agg['density_per_solvent'],
+                                                 "reports/figures/density_per_solvent.png", dpi),
+            delayed(_render_density_hist2d)(*agg['density_hist2d'], agg['density_fit'],
+                                            "reports/figures/solubility_vs_density.png", dpi),
+            delayed(_render_box)(agg['density_category_box'], 'Распределение растворимости в группах по плотности',
+                                 'Категория плотности растворителя', 'logS (моль/л)', 15, 'viridis', True,
+                                 "reports/figures/solubility_by_density_category.png", dpi, figsize=(10, 6)),
+            delayed(_render_density_by_solvent)(agg['density_by_solvent'],
+                                                "reports/figures/solubility_vs_density_by_solvent.png", dpi),
+        ]
+
+    print(f"🎨 Отрисовка {len(jobs)} графиков...")
+    Parallel(n_jobs=n_jobs, backend='loky')(jobs)
+    print("Визуализации сохранены в reports/figures/")
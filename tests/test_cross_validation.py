@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models import solubility_model
+from src.models.solubility_model import CATEGORICAL_FEATURES, NUMERICAL_FEATURES, cross_validate_models
+
+
+def _make_frame(n_compounds=12, rows_per_compound=4, seed=0):
+    rng = np.random.default_rng(seed)
+    n_rows = n_compounds * rows_per_compound
+    compound = np.repeat(np.arange(n_compounds), rows_per_compound)
+    df = pd.DataFrame(rng.normal(size=(n_rows, len(NUMERICAL_FEATURES))), columns=NUMERICAL_FEATURES)
+    # mol_weight однозначно определяет соединение, по нему восстанавливаем группы тестовых фолдов
+    df['mol_weight'] = 100.0 + compound
+    df['smiles'] = [f"C{'C' * i}O" for i in compound]
+    df[CATEGORICAL_FEATURES[0]] = rng.choice(["O", "CCO", "CS(C)=O"], n_rows)
+    df['log_s'] = df[NUMERICAL_FEATURES].sum(axis=1) * 0.01 + rng.normal(scale=0.1, size=n_rows)
+    return df
+
+
+def test_cross_validate_models_keeps_groups_in_one_test_fold(monkeypatch):
+    test_compounds = {}
+    evaluate_fold = solubility_model._evaluate_fold
+
+    def recording_evaluate_fold(name, data_path, fold, start, end):
+        X_values, _ = solubility_model.joblib.load(data_path, mmap_mode='r')
+        mol_weight = X_values[start:end, 1 + NUMERICAL_FEATURES.index('mol_weight')]
+        test_compounds[fold] = set(mol_weight.tolist())
+        return evaluate_fold(name, data_path, fold, start, end)
+
+    monkeypatch.setattr(solubility_model, "_evaluate_fold", recording_evaluate_fold)
+    folds_df, summary_df = cross_validate_models(_make_frame(), n_splits=3, n_jobs=1)
+
+    assert len(test_compounds) == 3
+    all_compounds = [c for compounds in test_compounds.values() for c in compounds]
+    assert len(all_compounds) == len(set(all_compounds)) == 12
+
+    n_models = len(solubility_model._build_models())
+    assert len(folds_df) == n_models * 3
+    assert summary_df["MAE"].is_monotonic_increasing
+
+
+def test_precomputed_groups_are_used_and_checked(monkeypatch):
+    df = _make_frame(n_compounds=4)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("группы не должны пересчитываться")
+
+    monkeypatch.setattr(solubility_model, "_make_groups", fail)
+    with pytest.raises(ValueError, match="--cv 5"):
+        cross_validate_models(df, n_splits=5, n_jobs=1, groups=df['smiles'].to_numpy())
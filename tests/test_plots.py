@@ -0,0 +1,110 @@
+import os
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.cbook import boxplot_stats
+
+matplotlib.use("Agg")
+
+from src.data import columnar
+from src.data.columnar import read_columns, write_columnar
+from src.visualization import plots
+from src.visualization.plots import _box_stats, compute_eda_aggregates, load_eda_aggregates
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Кэш агрегатов пишется в reports/cache относительно текущего каталога
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _make_data(n_rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    solvents = np.array(["O", "CCO", "CC(C)O", "C1CCOC1", "CS(C)=O", "CCCCCC", "ClCCl"])
+    solvent = rng.choice(solvents, n_rows, p=[0.3, 0.2, 0.15, 0.1, 0.1, 0.1, 0.05])
+    density = dict(zip(solvents, rng.uniform(0.6, 1.4, len(solvents))))
+    return pd.DataFrame({
+        "log_s": rng.standard_t(3, n_rows) - 3,
+        "solvent": solvent,
+        "solvent_smiles": solvent,
+        "temperature_k": rng.choice([288.15, 298.15, 308.15, 318.15], n_rows),
+        "density_g_ml": pd.Series(solvent).map(density).to_numpy(),
+    })
+
+
+def _assert_same(left, right):
+    if isinstance(left, dict):
+        assert left.keys() == right.keys()
+        for key in left:
+            _assert_same(left[key], right[key])
+    elif isinstance(left, (list, tuple)):
+        assert len(left) == len(right)
+        for a, b in zip(left, right):
+            _assert_same(a, b)
+    elif isinstance(left, str) or np.asarray(left).dtype == object:
+        assert np.array_equal(np.asarray(left), np.asarray(right))
+    else:
+        np.testing.assert_allclose(np.asarray(left, dtype=float), np.asarray(right, dtype=float))
+
+
+def test_box_stats_match_matplotlib():
+    df = _make_data()
+    order = ["O", "CCO", "ClCCl", "нет такого"]
+
+    stats = _box_stats(df["log_s"], df["solvent"], order)
+
+    assert [s["label"] for s in stats] == order[:3]
+    for s in stats:
+        (expected,) = boxplot_stats(df.loc[df["solvent"] == s["label"], "log_s"].to_numpy(), whis=1.5)
+        for key in ("q1", "med", "q3", "whislo", "whishi"):
+            assert s[key] == pytest.approx(expected[key]), key
+
+
+def test_second_load_hits_cache(monkeypatch):
+    _make_data().to_csv("data.csv", index=False)
+    calls = []
+
+    def counting_compute(*args, **kwargs):
+        calls.append(args)
+        return compute_eda_aggregates(*args, **kwargs)
+
+    monkeypatch.setattr(plots, "compute_eda_aggregates", counting_compute)
+    first = load_eda_aggregates("data.csv", density=True)
+    second = load_eda_aggregates("data.csv", density=True)
+
+    assert len(calls) == 1
+    _assert_same(first, second)
+
+    load_eda_aggregates("data.csv", density=True, use_cache=False)
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("density", [False, True])
+def test_columnar_copy_gives_same_aggregates_as_csv(monkeypatch, density):
+    df = _make_data()
+    df.to_csv("data.csv", index=False)
+    from_csv = compute_eda_aggregates("data.csv", density=density)
+
+    write_columnar(df, "data.csv")
+
+    def no_csv(*args, **kwargs):
+        raise AssertionError("свежая колоночная копия не должна читать CSV")
+
+    monkeypatch.setattr(columnar.pd, "read_csv", no_csv)
+    _assert_same(compute_eda_aggregates("data.csv", density=density), from_csv)
+
+
+def test_stale_columnar_copy_falls_back_to_csv():
+    df = _make_data()
+    df.to_csv("data.csv", index=False)
+    write_columnar(df, "data.csv")
+
+    # CSV перезаписан после колоночной копии: читаются новые данные
+    df.assign(log_s=0.0).to_csv("data.csv", index=False)
+    assert (read_columns("data.csv", ["log_s"])["log_s"] == 0.0).all()
+
+    os.remove(os.path.join(columnar.columnar_path("data.csv"), columnar.MANIFEST_FILE))
+    assert (read_columns("data.csv", ["log_s"])["log_s"] == 0.0).all()
@@ -0,0 +1,167 @@
+import errno
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+
+from src.models import registry
+from src.models.tree_arrays import MmapTreeEnsemble
+
+
+@pytest.fixture(autouse=True)
+def tmp_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "REGISTRY_DIR", str(tmp_path / "registry"))
+    monkeypatch.setattr(registry, "LEGACY_MODEL_PATH", str(tmp_path / "best_model.pkl"))
+    return tmp_path / "registry"
+
+
+def _register(model=None, **kwargs):
+    return registry.register_model(
+        model if model is not None else {"model": "stub"},
+        model_name="Stub", metrics={"mae": 0.1}, feature_schema={}, data_hash="h", training_time=0.0,
+        **kwargs
+    )
+
+
+def test_promote_rollback_promote():
+    v1, v2, v3 = _register(), _register(), _register()
+    assert (v1, v2, v3) == ("v0001", "v0002", "v0003")
+    assert registry.current_version() is None
+
+    registry.promote(v1)
+    registry.promote(v2)
+    assert registry.current_version() == v2
+
+    assert registry.rollback() == v1
+    assert registry.current_version() == v1
+
+    registry.promote(v3)
+    assert registry.current_version() == v3
+    assert registry.rollback() == v1
+    with pytest.raises(ValueError):
+        registry.rollback()
+
+
+def test_promote_unknown_version_keeps_pointer():
+    registry.promote(_register())
+    with pytest.raises(FileNotFoundError):
+        registry.promote("v0042")
+    assert registry.current_version() == "v0001"
+
+
+def test_version_allocation_skips_incomplete_directory(tmp_registry):
+    _register()
+    # Каталог, оставшийся от прерванного копирования: без metadata.json
+    os.makedirs(tmp_registry / "v0002" / "partial")
+
+    assert _register() == "v0003"
+    assert [meta["version"] for meta in registry.list_versions()] == ["v0001", "v0003"]
+
+
+def test_concurrent_registration_allocates_distinct_versions():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        versions = list(pool.map(lambda _: _register(), range(16)))
+
+    assert sorted(versions) == [f"v{i:04d}" for i in range(1, 17)]
+
+
+def test_concurrent_promotions_keep_full_history(tmp_registry):
+    versions = [_register() for _ in range(16)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(registry.promote, versions))
+
+    pointer = registry._read_pointer()
+    # Каждая версия либо активна, либо ровно один раз в истории: ни одна запись не потеряна
+    assert sorted(pointer["history"] + [pointer["current"]]) == versions
+    assert not [name for name in os.listdir(tmp_registry) if name.endswith(".tmp")]
+
+
+def test_collision_retries_with_next_number(tmp_registry, monkeypatch):
+    real_rename = os.rename
+    calls = []
+
+    def rename_losing_first_race(src, dst):
+        calls.append(dst)
+        if len(calls) == 1:
+            # Другой процесс успел создать ту же версию между выбором номера и rename
+            os.makedirs(os.path.join(dst, "other"))
+            raise OSError(errno.ENOTEMPTY, "Directory not empty", dst)
+        return real_rename(src, dst)
+
+    monkeypatch.setattr(registry.os, "rename", rename_losing_first_race)
+    assert _register() == "v0002"
+
+
+def test_persistent_error_is_raised_and_staging_removed(tmp_registry, monkeypatch):
+    def deny(src, dst):
+        raise PermissionError(errno.EACCES, "Permission denied", dst)
+
+    monkeypatch.setattr(registry.os, "rename", deny)
+    with pytest.raises(PermissionError):
+        _register()
+    assert os.listdir(tmp_registry) == []
+
+
+def test_load_model_falls_back_to_legacy_file():
+    joblib.dump({"legacy": True}, registry.LEGACY_MODEL_PATH)
+    assert registry.load_model() == {"legacy": True}
+
+    registry.promote(_register({"legacy": False}))
+    assert registry.load_model() == {"legacy": False}
+
+
+def test_holdout_is_stored_per_version():
+    holdout = pd.DataFrame({"temperature_k": [298.15], "log_s": [-2.0]})
+    v1 = _register(holdout=holdout)
+    v2 = _register()
+
+    pd.testing.assert_frame_equal(registry.load_holdout(v1), holdout)
+    assert registry.load_holdout(v2) is None
+
+
+def test_chain_data_hash_depends_on_parent():
+    X = pd.DataFrame({"a": [1.0, 2.0]})
+    y = pd.Series([0.5, 0.7], name="log_s")
+    assert registry.chain_data_hash("p1", X, y) != registry.chain_data_hash("p2", X, y)
+    assert registry.chain_data_hash("p1", X, y) == registry.chain_data_hash("p1", X, y)
+
+
+@pytest.mark.parametrize("model", [
+    RandomForestRegressor(n_estimators=20, random_state=0),
+    GradientBoostingRegressor(n_estimators=30, random_state=0),
+])
+def test_tree_ensembles_are_served_from_memory_mapped_arrays(model):
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 4))
+    y = X[:, 0] - 2 * X[:, 1] + rng.normal(scale=0.1, size=500)
+    pipeline = Pipeline([("preprocessor", StandardScaler()), ("regressor", model)]).fit(X, y)
+
+    version = _register(pipeline)
+    served = registry.load_model(version)
+    regressor = served.named_steps["regressor"]
+
+    assert isinstance(regressor, MmapTreeEnsemble)
+    assert isinstance(regressor.value, np.memmap)
+    X_test = rng.normal(size=(200, 4))
+    np.testing.assert_allclose(served.predict(X_test), pipeline.predict(X_test), rtol=1e-10, atol=1e-10)
+
+    # Для дообучения загружается исходная модель sklearn
+    assert isinstance(registry.load_model(version, mmap_mode=None).named_steps["regressor"], type(model))
+
+
+def test_other_models_have_no_serving_artifact():
+    from sklearn.pipeline import Pipeline
+
+    pipeline = Pipeline([("regressor", Ridge())]).fit(np.eye(3), np.arange(3.0))
+    version = _register(pipeline)
+    assert not os.path.exists(os.path.join(registry.REGISTRY_DIR, version, registry.SERVING_FILE))
+    assert isinstance(registry.load_model(version).named_steps["regressor"], Ridge)
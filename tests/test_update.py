@@ -0,0 +1,195 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from lightgbm import LGBMRegressor
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from src import update
+from src.data import load_data
+from src.data.load_data import MEASUREMENT_KEY, append_inhouse_data, load_inhouse_data, select_new_measurements
+from src.features.smiles_featurizer import featurize_compounds
+from src.models import registry, solubility_model
+from src.models.solubility_model import (
+    CATEGORICAL_FEATURES, FEATURES_PATH, HOLDOUT_GROUP_COLUMN, NUMERICAL_FEATURES,
+    _build_preprocessor, _continue_training, _save_best_model, update_model
+)
+
+FEATURES = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+
+# Соединения с попарно различной молекулярной массой: по mol_weight восстанавливается соединение
+COMPOUNDS = [
+    "CO", "CCO", "CCCO", "CCCCO", "CCCCCO", "CCCCCCO", "c1ccccc1", "Cc1ccccc1", "CCc1ccccc1", "CC(=O)O",
+    "CCC(=O)O", "CCN", "CCCl", "CCBr", "OCC(O)CO", "c1ccncc1", "c1ccc2ccccc2c1", "Oc1ccccc1",
+]
+HOLDOUT_COMPOUNDS = COMPOUNDS[:4]
+RAW_COLUMNS = [
+    'smiles', 'temperature_k', 'solvent', 'solvent_smiles', 'solubility_mol_l', 'solubility_mol_kg',
+    'log_s', 'compound_name', 'cas', 'pubchem_cid', 'is_organic', 'doi'
+]
+
+
+def _raw_measurements(compounds, temperatures=(288.15, 298.15, 308.15), solvents=("O", "CCO"), shift=0.0):
+    rows = []
+    for smiles in compounds:
+        for temperature in temperatures:
+            for solvent in solvents:
+                log_s = -0.2 * len(smiles) + 0.02 * (temperature - 298.15) - 0.5 * (solvent == "O") + shift
+                rows.append({
+                    'smiles': smiles, 'temperature_k': temperature, 'solvent': solvent, 'solvent_smiles': solvent,
+                    'solubility_mol_l': 10 ** log_s, 'solubility_mol_kg': np.nan, 'log_s': log_s,
+                    'compound_name': smiles, 'cas': '', 'pubchem_cid': '', 'is_organic': 'yes', 'doi': '',
+                })
+    return pd.DataFrame(rows, columns=RAW_COLUMNS)
+
+
+def _write_raw(df, path):
+    # Формат BigSolDBv2.0.csv: без заголовка
+    df.to_csv(path, header=False, index=False)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Все пути проекта относительные: реестр, хранилище и кэш признаков — внутри tmp_path
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/processed")
+    return tmp_path
+
+
+def _register_parent(regressor):
+    """Активная версия, обученная на всех соединениях, кроме HOLDOUT_COMPOUNDS."""
+    df = featurize_compounds(_raw_measurements(COMPOUNDS))
+    assert df.groupby('smiles')['mol_weight'].first().is_unique
+    df.to_csv(FEATURES_PATH, index=False)
+
+    is_holdout = df['smiles'].isin(HOLDOUT_COMPOUNDS)
+    train, holdout = df[~is_holdout], df[is_holdout]
+    pipeline = Pipeline([('preprocessor', _build_preprocessor()), ('regressor', regressor)])
+    pipeline.fit(train[FEATURES], train['log_s'])
+    return _save_best_model(
+        pipeline, type(regressor).__name__, metrics={"mae": 0.0}, feature_schema={}, data_hash="parent",
+        training_time=0.0,
+        holdout=holdout[FEATURES + ['log_s']].assign(**{HOLDOUT_GROUP_COLUMN: holdout['smiles'].to_numpy()}),
+        holdout_group_by='compound', measurement_hashes=set()
+    )
+
+
+def _file_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_rejected_update_keeps_pointer_and_data_stores(workdir):
+    parent = _register_parent(RandomForestRegressor(n_estimators=10, random_state=0))
+    features_before = _file_bytes(FEATURES_PATH)
+
+    # Заведомо неверные значения logS: дообученный лес ухудшит MAE на отложенной выборке
+    new_data = _raw_measurements(COMPOUNDS[4:10]).assign(log_s=2.0)
+    update.main([_write_raw(new_data, workdir / "new.csv"), "--n-estimators", "40"])
+
+    assert registry.current_version() == parent
+    assert [meta["version"] for meta in registry.list_versions()] == [parent]
+    assert load_inhouse_data() is None
+    assert _file_bytes(FEATURES_PATH) == features_before
+
+
+def test_rolled_back_measurements_are_applied_again(workdir):
+    parent = _register_parent(RandomForestRegressor(n_estimators=10, random_state=0))
+    new_csv = _write_raw(_raw_measurements(COMPOUNDS[4:8], temperatures=(318.15,)), workdir / "new.csv")
+
+    update.main([new_csv, "--tolerance", "10"])
+    first = registry.current_version()
+    assert first != parent
+    n_stored, n_cached = len(load_inhouse_data()), len(pd.read_csv(FEATURES_PATH))
+
+    # Повтор для той же активной версии ничего не меняет
+    update.main([new_csv, "--tolerance", "10"])
+    assert registry.current_version() == first
+
+    # После отката активная версия этих измерений не видела: они применяются снова, без дублей в данных
+    registry.rollback()
+    update.main([new_csv, "--tolerance", "10"])
+    assert registry.current_version() not in (parent, first)
+    assert registry.load_metadata()["parent"] == parent
+    assert len(load_inhouse_data()) == n_stored
+    assert len(pd.read_csv(FEATURES_PATH)) == n_cached
+
+
+def test_select_and_append_deduplicate_on_measurement_key():
+    df = load_data.load_solubility_data(_write_raw(_raw_measurements(COMPOUNDS[:3]), "raw.csv"))
+    repeated = pd.concat([df, df.iloc[:5].assign(compound_name="другое имя")], ignore_index=True)
+
+    assert len(select_new_measurements(repeated)) == len(df)
+    append_inhouse_data(repeated)
+    assert len(load_inhouse_data()) == len(df)
+
+    # Те же измерения уже в хранилище: новых нет, и повторная запись не удваивает его
+    assert select_new_measurements(df).empty
+    append_inhouse_data(df)
+    assert len(load_inhouse_data()) == len(df)
+    assert not load_inhouse_data().duplicated(subset=MEASUREMENT_KEY).any()
+
+    # Учтённые версией измерения задаются явно, а не хранилищем
+    assert len(select_new_measurements(df, seen_hashes=set())) == len(df)
+
+
+def test_new_rows_of_holdout_groups_are_not_trained_on():
+    parent = _register_parent(RandomForestRegressor(n_estimators=10, random_state=0))
+    n_holdout = len(registry.load_holdout(parent))
+
+    new_raw = _raw_measurements(HOLDOUT_COMPOUNDS[:1] + COMPOUNDS[4:6], temperatures=(318.15,))
+    holdout_copy = _raw_measurements(HOLDOUT_COMPOUNDS[1:2], temperatures=(298.15,), solvents=("O",))
+    new_df = featurize_compounds(pd.concat([new_raw, holdout_copy], ignore_index=True))
+
+    metrics = update_model(new_df, n_new_estimators=5, tolerance=10)
+
+    # 2 строки соединения из отложенной выборки — в неё, копия её строки — отброшена
+    assert metrics["n_new_rows"] == 4
+    assert len(registry.load_holdout(metrics["version"])) == n_holdout + 2
+
+
+class RecordingPipeline(Pipeline):
+    fitted_frames = []
+
+    def fit(self, X, y=None, **params):
+        RecordingPipeline.fitted_frames.append(X.copy())
+        return super().fit(X, y, **params)
+
+
+def test_full_refit_excludes_holdout_rows(monkeypatch):
+    parent = _register_parent(KNeighborsRegressor(n_neighbors=1))
+    holdout_weights = set(registry.load_holdout(parent)['mol_weight'])
+
+    monkeypatch.setattr(solubility_model, "Pipeline", RecordingPipeline)
+    RecordingPipeline.fitted_frames.clear()
+    new_df = featurize_compounds(_raw_measurements(COMPOUNDS[4:6], temperatures=(318.15,)))
+    metrics = update_model(new_df, tolerance=10)
+
+    assert metrics["method"] == "full refit on cached features"
+    (X_full,) = RecordingPipeline.fitted_frames
+    assert holdout_weights.isdisjoint(X_full['mol_weight'])
+    # Кэш без отложенных соединений плюс 4 новые строки
+    assert len(X_full) == 6 * (len(COMPOUNDS) - len(HOLDOUT_COMPOUNDS)) + 4
+
+
+@pytest.mark.parametrize("regressor, n_trees", [
+    (LGBMRegressor(n_estimators=10, verbose=-1), lambda model: model.booster_.num_trees()),
+    (XGBRegressor(n_estimators=10), lambda model: model.get_booster().num_boosted_rounds()),
+    (RandomForestRegressor(n_estimators=10, random_state=0), lambda model: len(model.estimators_)),
+    (GradientBoostingRegressor(n_estimators=10, random_state=0), lambda model: model.estimators_.shape[0]),
+])
+def test_continue_training_adds_trees(regressor, n_trees):
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(200, 3)), rng.normal(size=200)
+    regressor.fit(X, y)
+
+    updated, method = _continue_training(regressor, X[:50], y[:50], n_new_estimators=5)
+
+    assert method is not None
+    assert n_trees(updated) == 15
+    assert n_trees(regressor) == 10